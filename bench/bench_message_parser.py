@@ -0,0 +1,68 @@
+"""Compare the single-pass message parser with the previous line-by-line helpers.
+
+    python bench/bench_message_parser.py [--number 200]
+
+Each corpus reply (and its STRUCTURED_REPLIES equivalent) is formatted for
+display and has its speech text extracted, which is what one rendered
+assistant message costs per rerun.
+"""
+import argparse
+import timeit
+
+from corpus import load_corpus, structured_reply
+from legacy import extract_chinese_text, format_message_content
+from message_parser import format_message, parse_lines, parse_message, parse_structured, speech_text
+
+
+def legacy_render(replies):
+    for reply in replies:
+        format_message_content(reply)
+        extract_chinese_text(reply, "小明")
+
+
+def parsed_render(replies):
+    for reply in replies:
+        parsed = parse_lines(reply)
+        format_message(parsed)
+        speech_text(parsed, "小明")
+
+
+def cached_render(replies):
+    for reply in replies:
+        parsed = parse_message(reply)
+        format_message(parsed)
+        speech_text(parsed, "小明")
+
+
+def structured_render(replies):
+    for reply in replies:
+        parsed = parse_structured.__wrapped__(reply)
+        format_message(parsed)
+        speech_text(parsed, "小明")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="passes over the corpus per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    replies = load_corpus()
+    mismatches = sum(format_message(parse_lines(reply)) != format_message_content(reply) for reply in replies)
+    print(f"{len(replies)} replies, {mismatches} display mismatches against the previous formatter")
+
+    structured_replies = [structured_reply(reply) for reply in replies]
+    runs = [
+        ("legacy", legacy_render, replies),
+        ("single pass", parsed_render, replies),
+        ("single pass, cached", cached_render, replies),
+        ("structured (JSON)", structured_render, structured_replies),
+    ]
+    for name, render, corpus in runs:
+        best = min(timeit.repeat(lambda: render(corpus), number=args.number, repeat=args.repeat))
+        per_message = best / args.number / len(replies) * 1e6
+        print(f"{name:>20}: {per_message:8.1f} µs/message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Compare the compiled reaction classifier with the previous chained keyword scans.
+
+    python bench/bench_reactions.py [--number 200]
+
+Runs over the sample replies from SYSTEM_PROMPT plus their individual lines,
+so both long replies and short ones are covered.
+"""
+import argparse
+import timeit
+
+from corpus import load_corpus
+from legacy import get_appropriate_video
+from reactions import ReactionClassifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="passes over the corpus per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    replies = load_corpus()
+    messages = replies + [line for reply in replies for line in reply.split('\n') if line.strip()]
+    classifier = ReactionClassifier.from_config()
+
+    agreeing = sum(classifier.classify(message) == get_appropriate_video(message) for message in messages)
+    print(f"{len(messages)} messages, {agreeing} classified the same as before "
+          "(differences come from weighted scoring across categories)")
+
+    runs = [
+        ("chained any()", lambda: [get_appropriate_video(message) for message in messages]),
+        ("compiled classifier", lambda: [classifier.classify(message) for message in messages]),
+    ]
+    for name, run in runs:
+        best = min(timeit.repeat(run, number=args.number, repeat=args.repeat))
+        per_message = best / args.number / len(messages) * 1e6
+        print(f"{name:>20}: {per_message:8.2f} µs/message")
+
+    build = min(timeit.repeat(ReactionClassifier.from_config, number=100, repeat=args.repeat)) / 100 * 1e6
+    print(f"{'build (once)':>20}: {build:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
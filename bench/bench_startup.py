@@ -0,0 +1,101 @@
+"""Cold-start breakdown: import time per module main.py imports, and the first script run by stage.
+
+    python bench/bench_startup.py [--output FILE]
+
+Both parts run in fresh interpreters so nothing is already imported. The
+import part uses `python -X importtime` over main.py's own import list; the
+first-run part executes the app once with Streamlit's AppTest and reads the
+stages recorded by src/startup.py. Results are printed as JSON.
+"""
+import os
+import ast
+import sys
+import json
+import argparse
+import subprocess
+
+from corpus import SRC_DIR
+
+APP_PATH = os.path.join(SRC_DIR, "main.py")
+
+FIRST_RUN_SCRIPT = """
+import os, sys, json, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({app_path!r}, default_timeout=60)
+started = time.perf_counter()
+app.run()
+wall = time.perf_counter() - started
+profile = sys.modules["startup"].startup_profile
+print(json.dumps({{
+    "wall_ms": round(wall * 1000, 1),
+    "stages_ms": {{stage: round(seconds * 1000, 1) for stage, seconds in profile.stages.items()}},
+    "openai_imported": "openai" in sys.modules,
+    "tiktoken_imported": "tiktoken" in sys.modules,
+    "exception": str(app.exception[0].message) if app.exception else None,
+}}))
+"""
+
+
+def main_imports():
+    """Top-level module names imported by main.py, in order"""
+    with open(APP_PATH, encoding="utf-8") as app_file:
+        tree = ast.parse(app_file.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def import_times():
+    """Cumulative milliseconds per module, each measured after the ones before it"""
+    modules = main_imports()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {name}" for name in modules)],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Top-level entries are not indented
+        if not name.startswith("  ") and name.strip() in modules:
+            times[name.strip()] = round(int(cumulative) / 1000, 1)
+    return {name: times.get(name, 0.0) for name in modules}
+
+
+def first_run(env):
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_RUN_SCRIPT.format(app_path=APP_PATH)],
+        cwd=SRC_DIR, capture_output=True, text=True, env=env, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    # The first page must not need the network; an unroutable base URL makes any call fail loudly
+    env = dict(os.environ, OPENAI_API_KEY="sk-bench", OPENAI_BASE_URL="http://127.0.0.1:9/v1")
+    imports = import_times()
+    results = {
+        "imports_ms": imports,
+        "imports_total_ms": round(sum(imports.values()), 1),
+        "first_run": first_run(env),
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
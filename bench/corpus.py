@@ -0,0 +1,46 @@
+"""Realistic tutor replies for the benchmarks, taken from the example scenarios in SYSTEM_PROMPT"""
+import os
+import re
+import sys
+import json
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from prompts import SYSTEM_PROMPT  # noqa: E402
+from onboarding import GREETING_MESSAGE, NAME_REPLY_TEMPLATE  # noqa: E402
+from message_parser import parse_lines  # noqa: E402
+
+# "1. Basic Ordering Scenario:", "2. Menu Help:" ... start a new example
+SCENARIO_HEADER = re.compile(r'(?m)^\d+\. [A-Z][^\n:]*:\s*$')
+# Prompt sections that follow the last example of a block
+TRAILING_SECTION = re.compile(r'(?m)^(Essential Café|Remember:|Example|Café Learning|Detailed Café|\[Continue)')
+
+
+def load_corpus():
+    """Return the list of sample replies"""
+    replies = []
+    # The first block is the persona description, not an example
+    for block in SCENARIO_HEADER.split(SYSTEM_PROMPT)[1:]:
+        block = TRAILING_SECTION.split(block)[0].strip()
+        if re.search(r'[一-鿿]', block) and ('👉' in block or 'Suggested' in block):
+            replies.append(block)
+    replies.append(GREETING_MESSAGE)
+    replies.append(NAME_REPLY_TEMPLATE.format(name="小明"))
+    return replies
+
+
+def structured_reply(reply):
+    """The same reply as STRUCTURED_REPLIES would return it"""
+    parsed = parse_lines(reply)
+    return json.dumps({
+        "scene": parsed.scene,
+        "chinese": " ".join(parsed.chinese),
+        "pinyin": " ".join(parsed.pinyin),
+        "english": " ".join(parsed.translation),
+        "suggestions": [
+            {"chinese": s.chinese, "pinyin": s.pinyin, "english": s.english} for s in parsed.suggestions
+        ],
+        "vocab": [{"word": word, "pinyin": pinyin, "meaning": meaning} for word, pinyin, meaning in parsed.words]
+    }, ensure_ascii=False)
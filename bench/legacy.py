@@ -0,0 +1,113 @@
+"""Message-processing functions as they were before the single-pass parser and the reaction classifier.
+
+Kept verbatim as the baseline for the benchmarks; not used by the app.
+"""
+
+
+def extract_chinese_text(text, user_name=None):
+    """TTS text selection from text_to_speech, without the API call"""
+    lines = text.split('\n')
+    chinese_sentences = []
+
+    for line in lines:
+        # Skip empty lines, translations, or section markers
+        if not line.strip() or any(marker in line for marker in ['Word-by-Word', 'Suggested', '---', 'Try', '🎯', 'Word Explanation:']):
+            continue
+
+        # Skip lines that are translations (in parentheses)
+        if line.strip().startswith('('):
+            continue
+
+        # Get Chinese text before any translation
+        chinese_part = line.split('(')[0].strip()
+
+        # If line contains Chinese characters and isn't a scene description
+        if any('\u4e00' <= c <= '\u9fff' for c in chinese_part) and not (chinese_part.startswith('*') and chinese_part.endswith('*')):
+            chinese_sentences.append(chinese_part)
+
+    # Combine all Chinese sentences
+    chinese_text = ' '.join(chinese_sentences)
+
+    # Replace [name] with actual name if present
+    if user_name and chinese_text:
+        chinese_text = chinese_text.replace("[name]", user_name)
+    return chinese_text
+
+
+def format_message_content(content):
+    """Format the message content with proper spacing"""
+    lines = content.split('\n')
+    formatted_lines = []
+    
+    for line in lines:
+        # Skip the "Repeat after me" header and dividers
+        if any(skip in line for skip in ['🎯 Repeat after me:', '-------------------']):
+            continue
+            
+        # Handle Chinese text and translations
+        elif '(' in line and ')' in line and any('\u4e00' <= c <= '\u9fff' for c in line):
+            # Split multiple sentences if they exist
+            sentences = line.split('。')
+            for sentence in sentences:
+                if sentence.strip():
+                    formatted_lines.append(sentence.strip() + '。')
+                    formatted_lines.append('')  # Add empty line after each sentence
+            
+        # Handle section headers
+        elif line.startswith('Word-by-Word Breakdown:'):
+            formatted_lines.extend(['', line, ''])
+            
+        # Handle suggested responses section
+        elif line.startswith('Suggested Responses:') or line.startswith('👉 Try'):
+            formatted_lines.extend([
+                '',
+                '---',
+                '👉 Try one of these responses:',
+                ''
+            ])
+            
+        # Handle numbered responses
+        elif line.strip().startswith(('1.', '2.', '3.')):
+            parts = line.split(')')
+            if len(parts) > 1:
+                formatted_lines.extend([
+                    '',
+                    f'🗣 {parts[0]})',  # Chinese
+                    f'   {parts[1].strip()}' if len(parts) > 1 else '',  # Pinyin
+                ])
+            else:
+                formatted_lines.extend(['', f'🗣 {line}'])
+            
+        # Handle word explanations
+        elif 'Word Explanation:' in line:
+            formatted_lines.extend(['', '   ' + line])
+            
+        # Handle scenario descriptions
+        elif line.startswith('*') and line.endswith('*'):
+            formatted_lines.extend(['', line, ''])
+            
+        # Handle other lines that aren't empty
+        elif line.strip():
+            formatted_lines.append(line)
+    
+    return '\n'.join(formatted_lines)
+
+
+def get_appropriate_video(message_content):
+    """Reaction selection from main.py, returning the category instead of its URL"""
+    # Check message content for relevant keywords/sentiment
+    content_lower = message_content.lower()
+
+    if any(word in content_lower for word in ["谢谢", "thank", "great", "good job", "well done", "很好"]):
+        return "appreciation"
+    elif any(word in content_lower for word in ["对不起", "sorry", "sad", "难过"]):
+        return "crying"
+    elif any(word in content_lower for word in ["太棒了", "wonderful", "amazing", "excellent", "开心"]):
+        return "cheering"
+    elif any(word in content_lower for word in ["哎呀", "唉", "difficult", "hard", "不好"]):
+        return "sighing"
+    elif any(word in content_lower for word in ["让我想想", "think", "考虑", "interesting", "hmm"]):
+        return "thinking"
+
+    # Default to thinking video if no specific sentiment is matched
+    return "thinking"
@@ -0,0 +1,165 @@
+"""Offline benchmark suite for the message-processing hot paths and whole chat turns.
+
+    python bench/run_bench.py [--turns 4] [--chat-latency 0.3] [--chunk-latency 0.005]
+                              [--speech-latency 0.5] [--structured] [--no-stream] [--output FILE]
+
+Micro-benchmarks time display formatting (format_message(parse_lines(...))),
+speech text extraction (speech_text) and reaction selection
+(ReactionClassifier.classify) on the sample replies from SYSTEM_PROMPT,
+uncached. The end-to-end part runs
+the app with Streamlit's AppTest against bench/stub_openai.py and times each
+turn until the reply is rendered and until its audio is ready. No network or
+API key is needed. Results are printed (or written) as one JSON document, so
+two runs can be diffed in review.
+"""
+import os
+import json
+import time
+import argparse
+import platform
+import shutil
+import statistics
+import tempfile
+import timeit
+from collections import Counter
+from concurrent.futures import wait
+
+from corpus import SRC_DIR, load_corpus
+from message_parser import format_message, parse_lines, speech_text
+from reactions import ReactionClassifier
+from stub_openai import StubOpenAI
+
+APP_PATH = os.path.join(SRC_DIR, "main.py")
+ONBOARDING_MESSAGES = ["我叫小明", "beginner"]
+CHAT_MESSAGES = ["我想要一杯拿铁", "你推荐什么？", "谢谢你，太棒了！", "这个多少钱？"]
+
+
+def time_per_message(function, replies, number, repeat):
+    """Best-of-repeat microseconds per call"""
+    best = min(timeit.repeat(lambda: [function(reply) for reply in replies], number=number, repeat=repeat))
+    return round(best / number / len(replies) * 1e6, 2)
+
+
+def run_micro(number, repeat):
+    replies = load_corpus()
+    classifier = ReactionClassifier.from_config()
+    benchmarks = {
+        "format_message": lambda reply: format_message(parse_lines(reply)),
+        "speech_text": lambda reply: speech_text(parse_lines(reply), "小明"),
+        "classify_reaction": classifier.classify,
+    }
+    return {
+        name: {"us_per_message": time_per_message(function, replies, number, repeat), "messages": len(replies)}
+        for name, function in benchmarks.items()
+    }
+
+
+def summarize(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "mean": round(statistics.fmean(values), 4),
+        "p50": round(statistics.median(values), 4),
+        "max": round(values[-1], 4),
+    }
+
+
+def run_turns(args):
+    stub = StubOpenAI(args.chat_latency, args.chunk_latency, args.speech_latency).start()
+    cache_dir = tempfile.mkdtemp(prefix="bench-audio-")
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": stub.base_url,
+        "AUDIO_CACHE_DIR": cache_dir,
+        "SESSION_DB": "",
+        "TTS_BACKEND": "openai",
+        "STREAM_COMPLETIONS": "0" if args.no_stream else "1",
+        "STRUCTURED_REPLIES": "1" if args.structured else "0",
+    })
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    started = time.perf_counter()
+    app.run()
+    first_paint = time.perf_counter() - started
+    if app.exception:
+        raise RuntimeError(f"app failed on first run: {app.exception}")
+
+    messages = ONBOARDING_MESSAGES + [CHAT_MESSAGES[i % len(CHAT_MESSAGES)] for i in range(args.turns)]
+    turns = []
+    for message in messages:
+        request_count = len(stub.requests)
+        started = time.perf_counter()
+        app.chat_input[0].set_value(message).run()
+        rendered = time.perf_counter() - started
+        if app.exception:
+            raise RuntimeError(f"app failed on {message!r}: {app.exception}")
+
+        # Speech is synthesized in the background after the reply is drawn
+        pending = list(app.session_state["pending_audio"].values())
+        wait(pending, timeout=args.timeout)
+        audio_ready = time.perf_counter() - started if pending else None
+
+        paths = Counter(path for path, _ in stub.requests[request_count:])
+        turns.append({
+            "message": message,
+            "kind": "llm" if any(path.endswith("/chat/completions") for path in paths) else "scripted",
+            "render_s": round(rendered, 4),
+            "audio_ready_s": round(audio_ready, 4) if audio_ready is not None else None,
+            "requests": dict(paths),
+        })
+    stub.shutdown()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    summary = {}
+    for kind in ("scripted", "llm"):
+        kind_turns = [turn for turn in turns if turn["kind"] == kind]
+        summary[kind] = {
+            "turns": len(kind_turns),
+            "render_s": summarize([turn["render_s"] for turn in kind_turns]),
+            "audio_ready_s": summarize([turn["audio_ready_s"] for turn in kind_turns if turn["audio_ready_s"] is not None]),
+        }
+    return {"first_paint_s": round(first_paint, 4), "summary": summary, "turns": turns}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=4, help="free-chat turns after onboarding")
+    parser.add_argument("--chat-latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--chunk-latency", type=float, default=0.005, help="seconds between streamed chunks")
+    parser.add_argument("--speech-latency", type=float, default=0.5, help="seconds per speech request")
+    parser.add_argument("--structured", action="store_true", help="run with STRUCTURED_REPLIES=1")
+    parser.add_argument("--no-stream", action="store_true", help="run with STREAM_COMPLETIONS=0")
+    parser.add_argument("--number", type=int, default=100, help="corpus passes per micro-benchmark measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--skip-turns", action="store_true", help="micro-benchmarks only")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "config": {
+            "turns": args.turns,
+            "chat_latency": args.chat_latency,
+            "chunk_latency": args.chunk_latency,
+            "speech_latency": args.speech_latency,
+            "structured": args.structured,
+            "stream": not args.no_stream,
+        },
+        "micro": run_micro(args.number, args.repeat),
+    }
+    if not args.skip_turns:
+        results["end_to_end"] = run_turns(args)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Local stand-in for the OpenAI endpoints the app calls, with injected latency.
+
+Serves chat completions (plain, streamed and JSON-schema), text-to-speech and
+model lookups on 127.0.0.1. Chat replies cycle through the sample replies so
+the app does realistic parsing work. Point the app at it with
+OPENAI_BASE_URL=<server.base_url>.
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from corpus import load_corpus, structured_reply
+
+STREAM_CHUNK_CHARS = 16
+
+
+class StubOpenAI(ThreadingHTTPServer):
+    """HTTP server holding the latency settings and a log of (path, seconds) per request.
+
+    chat_latency is the delay before the first token, chunk_latency the delay
+    between streamed chunks, speech_latency the delay before audio is returned.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, chat_latency=0.0, chunk_latency=0.0, speech_latency=0.0, port=0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.chat_latency = chat_latency
+        self.chunk_latency = chunk_latency
+        self.speech_latency = speech_latency
+        self.replies = load_corpus()
+        self._lock = threading.Lock()
+        self._reply_index = 0
+        self.requests = []
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}/v1"
+
+    def next_reply(self):
+        with self._lock:
+            reply = self.replies[self._reply_index % len(self.replies)]
+            self._reply_index += 1
+        return reply
+
+    def log_request_time(self, path, seconds):
+        with self._lock:
+            self.requests.append((path, seconds))
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, content_type, data):
+        self.send_response(200)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        started = time.perf_counter()
+        model = self.path.rsplit("/", 1)[-1]
+        self.send_body("application/json", json.dumps(
+            {"id": model, "object": "model", "created": 0, "owned_by": "stub"}
+        ).encode())
+        self.server.log_request_time(self.path, time.perf_counter() - started)
+
+    def do_POST(self):
+        started = time.perf_counter()
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        if self.path.endswith("/audio/speech"):
+            time.sleep(self.server.speech_latency)
+            self.send_body("audio/mpeg", b"ID3" + body.get("input", "").encode())
+        else:
+            self.chat_completion(body)
+        self.server.log_request_time(self.path, time.perf_counter() - started)
+
+    def chat_completion(self, body):
+        time.sleep(self.server.chat_latency)
+        content = self.server.next_reply()
+        if body.get("response_format"):
+            content = structured_reply(content)
+        usage = {
+            "prompt_tokens": sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4,
+            "completion_tokens": len(content) // 4,
+            "prompt_tokens_details": {"cached_tokens": 0}
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": "stub", "created": 0, "model": body.get("model", "")}
+
+        if not body.get("stream"):
+            self.send_body("application/json", json.dumps(dict(
+                base,
+                object="chat.completion",
+                choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                usage=usage
+            )).encode())
+            return
+
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.end_headers()
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            chunk = dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"content": content[start:start + STREAM_CHUNK_CHARS]}, "finish_reason": None}
+            ])
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.server.chunk_latency)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk = dict(base, object="chat.completion.chunk", choices=[], usage=usage)
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
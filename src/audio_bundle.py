@@ -0,0 +1,63 @@
+"""Pre-synthesized speech for the fixed onboarding lines.
+
+The app loads this bundle at startup so the greeting plays without any
+network call. Regenerate it after changing a phrase, the model or the voice:
+
+    python src/audio_bundle.py
+"""
+import os
+import json
+from audio_cache import make_audio_key
+
+BUNDLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "audio")
+MANIFEST_PATH = os.path.join(BUNDLE_DIR, "manifest.json")
+
+# Fixed lines spoken during onboarding (the name reply is "你好，{name}！" + drink_prompt)
+BUNDLE_PHRASES = {
+    "greeting": "欢迎光临！请问你叫什么名字呢？",
+    "drink_prompt": "今天想喝点什么呢？",
+}
+
+
+def load_bundle():
+    """Return {audio key: mp3 bytes} for every bundled phrase found on disk"""
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+    bundle = {}
+    for entry in manifest.get("phrases", {}).values():
+        try:
+            with open(os.path.join(BUNDLE_DIR, entry["file"]), "rb") as audio_file:
+                audio_bytes = audio_file.read()
+        except OSError:
+            continue
+        key = make_audio_key(manifest["model"], manifest["voice"], entry["text"])
+        bundle[key] = audio_bytes
+    return bundle
+
+
+def build_bundle(client, model, voice):
+    """Synthesize every bundled phrase and write the mp3 files plus manifest"""
+    os.makedirs(BUNDLE_DIR, exist_ok=True)
+    phrases = {}
+    for name, text in BUNDLE_PHRASES.items():
+        response = client.audio.speech.create(model=model, voice=voice, input=text)
+        file_name = f"{name}.mp3"
+        with open(os.path.join(BUNDLE_DIR, file_name), "wb") as audio_file:
+            audio_file.write(response.content)
+        phrases[name] = {"text": text, "file": file_name}
+        print(f"✅ {name}: {text} -> {file_name}")
+
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as manifest_file:
+        json.dump({"model": model, "voice": voice, "phrases": phrases}, manifest_file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from openai import OpenAI
+
+    load_dotenv()
+    build_bundle(OpenAI(), model="tts-1", voice="nova")
@@ -0,0 +1,151 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Disk eviction frees space down to this fraction of the budget, so it doesn't rescan on every put
+DISK_LOW_WATER = 0.9
+
+
+def make_audio_key(model, voice, text):
+    """Build a content address for synthesized speech from (model, voice, normalized text)"""
+    # Collapse whitespace so formatting differences don't cause cache misses
+    normalized = " ".join(text.split())
+    digest = hashlib.sha256(f"{model}\0{voice}\0{normalized}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AudioCache:
+    """Speech audio cache: bounded in-memory LRU in front of a size-bounded disk store.
+
+    Shared by every session in the process, so all access goes through a lock.
+    """
+
+    def __init__(self, cache_dir, max_memory_items=256, max_disk_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # Held by the one thread evicting; others skip, since that pass makes room for them too
+        self._evict_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def _disk_files(self):
+        """(mtime, size, path) of each cached file, statted once; files deleted meanwhile are skipped"""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".audio"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def get(self, key):
+        """Return cached audio bytes for key, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as audio_file:
+                data = audio_file.read()
+            # Touch the file so disk eviction is least-recently-used too
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        """Store audio bytes in both tiers"""
+        with self._lock:
+            self._remember(key, data)
+
+        path = self._path(key)
+        existed = os.path.exists(path)
+        # Write to a unique temp file and rename so concurrent writers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+        if not existed:
+            with self._lock:
+                self._disk_bytes += len(data)
+                over_budget = self._disk_bytes > self.max_disk_bytes
+            if over_budget:
+                self._evict_disk()
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Delete least recently used files until the disk tier is back under DISK_LOW_WATER of its budget"""
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            # Puts that skipped eviction while a pass ran get another pass
+            while self._evict_pass():
+                pass
+        finally:
+            self._evict_lock.release()
+
+    def _evict_pass(self):
+        """One scan and delete; True if concurrent puts left the tier over budget again"""
+        with self._lock:
+            counted_before_scan = self._disk_bytes
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * DISK_LOW_WATER
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            total -= size
+        with self._lock:
+            # Keep what concurrent puts added while this pass ran
+            added = max(0, self._disk_bytes - counted_before_scan)
+            self._disk_bytes = total + added
+            return added > 0 and self._disk_bytes > self.max_disk_bytes
+
+    def stats(self):
+        """Hit/miss counters and tier sizes, for sizing the cache"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
@@ -0,0 +1,209 @@
+"""Deadlines, retries and hedged requests for API calls.
+
+A CallPolicy runs a request, which is a callable taking the timeout in
+seconds for one attempt. Failures that are worth repeating (timeouts,
+connection errors, 408/409/429/5xx) are retried with exponential backoff and
+full jitter. Retry-After is honoured up to max_delay, and everything stays
+inside the call's overall deadline. Other errors are raised at once.
+
+With hedging enabled, an attempt that has not finished by the
+hedge_percentile of recent latencies gets a duplicate request, and the
+first reply to arrive wins. This trims the slow tail for idempotent calls
+such as speech synthesis, at the cost of the occasional extra request.
+Retries, timeouts and hedges are counted, and each attempt's latency is
+observed, on the metrics object if one is given. Requests that run beyond
+the caller's own wait (the duplicate, and the slower request after the
+winner returns) are reported to `occupy`, e.g. RequestGate.occupy, which
+returns the function to call when the request ends.
+"""
+import time
+import random
+import asyncio
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# openai's exception names, matched by name so openai stays a lazy import
+RETRYABLE_ERRORS = {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError"}
+
+
+def is_retryable(error):
+    """Whether a failed attempt is worth repeating"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (Retry-After header), else None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call ran out of its overall deadline"""
+
+
+class CallPolicy:
+    """Timeout per attempt, overall deadline, retries and optional hedging for one kind of call"""
+
+    def __init__(self, name, timeout=30.0, deadline=60.0, max_attempts=3, base_delay=0.5, max_delay=8.0,
+                 hedge_percentile=None, hedge_min_samples=20, hedge_workers=4, metrics=None, occupy=None):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.metrics = metrics
+        self.occupy = occupy
+        self._lock = threading.Lock()
+        self._latency = Histogram()
+        self._executor = (
+            ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix=f"{name}-hedge")
+            if hedge_percentile else None
+        )
+        self.counts = dict.fromkeys(("calls", "attempts", "retries", "failures", "hedges", "hedge_wins"), 0)
+
+    def _count(self, event):
+        with self._lock:
+            self.counts[event] += 1
+        if self.metrics is not None:
+            self.metrics.count(f"{self.name}.{event}")
+
+    def _observe(self, seconds):
+        with self._lock:
+            self._latency.observe(seconds)
+        if self.metrics is not None:
+            self.metrics.observe(f"api.{self.name}", seconds)
+
+    def backoff(self, attempt, error=None):
+        """Full-jitter exponential delay before the given retry (1-based), at least any Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        requested = retry_after(error)
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_delay))
+        return delay
+
+    def _hedge_delay(self):
+        if not self.hedge_percentile or self._latency.count < self.hedge_min_samples:
+            return None
+        return self._latency.quantile(self.hedge_percentile)
+
+    def hedge_delay(self):
+        """Seconds after which an attempt gets a duplicate, or None while hedging is off or still learning"""
+        with self._lock:
+            return self._hedge_delay()
+
+    def _attempt_timeout(self, deadline):
+        """Timeout for the next attempt, counted as one attempt"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._count("failures")
+            raise DeadlineExceeded(f"{self.name} call exceeded its {self.deadline:.0f}s deadline")
+        self._count("attempts")
+        return min(self.timeout, remaining)
+
+    def _retry_delay(self, attempt, error, deadline):
+        """Seconds to wait before retrying a failed attempt, or None when the failure is final"""
+        delay = self.backoff(attempt, error)
+        if not is_retryable(error) or attempt >= self.max_attempts or time.monotonic() + delay >= deadline:
+            self._count("failures")
+            return None
+        self._count("retries")
+        logger.info("%s attempt %d failed (%s), retrying in %.2fs", self.name, attempt, error, delay)
+        return delay
+
+    def call(self, request):
+        """Run request(timeout) under this policy and return its result"""
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = self._attempt_timeout(deadline)
+            started = time.monotonic()
+            try:
+                result = self._attempt(request, timeout)
+            except Exception as e:
+                delay = self._retry_delay(attempt, e, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._observe(time.monotonic() - started)
+            return result
+
+    async def call_async(self, request):
+        """call() for a coroutine function request(timeout), waiting out backoff on the event loop (no hedging)"""
+        self._count("calls")
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = self._attempt_timeout(deadline)
+            started = time.monotonic()
+            try:
+                result = await request(timeout)
+            except Exception as e:
+                delay = self._retry_delay(attempt, e, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._observe(time.monotonic() - started)
+            return result
+
+    def _occupy_until_done(self, future):
+        if self.occupy is not None:
+            release = self.occupy()
+            future.add_done_callback(lambda _: release())
+
+    def _attempt(self, request, timeout):
+        hedge_after = self.hedge_delay()
+        if hedge_after is None or hedge_after >= timeout:
+            return request(timeout)
+
+        started = time.monotonic()
+        first = self._executor.submit(request, timeout)
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result()
+
+        self._count("hedges")
+        second = self._executor.submit(request, max(0.0, timeout - (time.monotonic() - started)))
+        self._occupy_until_done(second)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - started)), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"{self.name} attempt timed out after {timeout:.1f}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                        # The first request outlives this call now, so it no longer runs under the caller's slot
+                        if not first.done():
+                            self._occupy_until_done(first)
+                    # The slower request is left to finish on its own; its result is dropped
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, hedge_after=self._hedge_delay())
@@ -0,0 +1,86 @@
+"""Token-budgeted chat context.
+
+The most recent messages are sent verbatim; older ones are folded into a
+running summary that is updated incrementally, so prompt size stays flat as
+a session grows.
+"""
+import re
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+CJK_PATTERN = re.compile(r'[　-〿㐀-鿿＀-￯]')
+
+SUMMARY_INSTRUCTIONS = """You maintain the running summary of a Chinese tutoring role-play in a café.
+Merge the new messages into the current summary. Keep the learner's name and level, what was ordered,
+vocabulary already practiced, the current scene and any open questions. Reply with the summary only,
+in English, under 120 words."""
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """cl100k_base, loaded on first use so tiktoken stays off the cold start (None without tiktoken)"""
+    try:
+        import tiktoken
+    except ImportError:  # Optional: fall back to an estimate when tiktoken isn't installed
+        return None
+    try:
+        # Downloads the BPE file on first use, which fails on hosts without network access
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable, estimating token counts: %s", e)
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Count tokens with tiktoken, or estimate them (1 per CJK character, 1 per 4 other characters)"""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    cjk_chars = len(CJK_PATTERN.findall(text))
+    return cjk_chars + (len(text) - cjk_chars + 3) // 4
+
+
+def count_message_tokens(message):
+    return MESSAGE_OVERHEAD_TOKENS + count_tokens(message["content"])
+
+
+def plan_context(history, summarized_upto, fixed_tokens, budget, recent_messages, fold_batch):
+    """Return the index of the first history message to send verbatim.
+
+    Everything between summarized_upto and that index has to be folded into
+    the summary first. Folding waits until fold_batch messages have aged out
+    of the recent window so the summary isn't rewritten on every turn, but
+    the token budget always wins: the oldest verbatim messages are folded
+    until the prompt fits (the newest message is always kept).
+    """
+    start = max(summarized_upto, len(history) - recent_messages)
+    if start - summarized_upto < fold_batch:
+        start = summarized_upto
+
+    tokens = fixed_tokens + sum(count_message_tokens(m) for m in history[start:])
+    while tokens > budget and start < len(history) - 1:
+        tokens -= count_message_tokens(history[start])
+        start += 1
+    return start
+
+
+def update_summary(client, model, summary, messages, max_tokens):
+    """Fold messages into the running summary with one small completion; returns (summary, usage)"""
+    transcript = "\n".join(
+        f"{'Learner' if m['role'] == 'user' else 'Tutor'}: {m['content']}" for m in messages
+    )
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"}
+        ],
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content.strip(), response.usage
@@ -1,99 +1,465 @@
+from startup import startup_profile
 import os
-import json
+import time
+import uuid
 import streamlit as st
-from openai import OpenAI
-import base64
-import requests
-from streamlit.components.v1 import html
-import streamlit.components.v1 as components
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from dotenv import load_dotenv
 import random
+from concurrent.futures import ThreadPoolExecutor
+from audio_cache import AudioCache, make_audio_key
+from audio_bundle import BUNDLE_PHRASES, load_bundle
+from context_window import count_tokens, plan_context, update_summary
+from usage import UsageTotals, UsageTracker, configure_usage_log
+from metrics import LatencyMetrics
+from session_store import SessionStore
+from scheduler import GateFull, RequestGate
+from call_policy import CallPolicy
+from turn_engine import TurnEngine
+from onboarding import AWAITING_NAME, GREETING_MESSAGE, NAME_RETRY_SPEECH, handle_turn
+from speech import EspeakSpeech, FallbackSpeech, OpenAISpeech, audio_format
+from video_assets import load_video_sources
+from reactions import ReactionClassifier
+from prompts import REPLY_SCHEMA, STRUCTURED_INSTRUCTIONS, SYSTEM_PROMPT
+from message_parser import (
+    classify_line, ends_reply, format_line, format_message, parse_lines, parse_message, parse_structured, speech_text
+)
+startup_profile.mark("imports")
+
+@st.cache_resource(show_spinner=False)
+def load_environment():
+    """Read .env once per process rather than on every rerun"""
+    load_dotenv()
+    return True
 
 # Load environment variables
-load_dotenv()
+load_environment()
 
 # Get API key from environment variables
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     st.error("❌ No OpenAI API key found. Please check your .env file.")
     st.stop()
+startup_profile.mark("config")
+
+# Chat model for text replies. gpt-3.5-turbo gets no automatic prompt caching, so cached tokens
+# stay at 0 unless this is set to a model that does (gpt-4o, gpt-4o-mini)
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+
+# Seconds between API health checks (shared by every session in this process)
+HEALTH_CHECK_TTL = int(os.getenv("HEALTH_CHECK_TTL", "600"))
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key):
+    """Create the OpenAI client once per process so all sessions share its connection pool"""
+    # Imported on first use: openai is the slowest import and the first page doesn't need it
+    from openai import OpenAI
+    # Retries are left to the call policies (get_chat_policy, get_tts_policy)
+    return OpenAI(api_key=api_key, max_retries=0)
+
+@st.cache_data(ttl=HEALTH_CHECK_TTL, show_spinner=False)
+def check_api_health(api_key):
+    """Verify the API key once per process, then again every HEALTH_CHECK_TTL seconds"""
+    # Failures raise and are not cached, so the next rerun checks again
+    get_chat_policy().call(lambda timeout: get_openai_client(api_key).models.retrieve(CHAT_MODEL, timeout=timeout))
+    get_usage_tracker().record_request("health_check")
+    return True
+
+# Usage ledger for capacity planning: one JSON line per API call, rotated by size
+USAGE_LOG_FILE = os.getenv("USAGE_LOG_FILE")
+USAGE_LOG_MAX_BYTES = int(os.getenv("USAGE_LOG_MAX_BYTES", "10000000"))
+
+@st.cache_resource(show_spinner=False)
+def get_usage_tracker():
+    """Process-wide token, character and cost totals (prompt cache hits included)"""
+    if USAGE_LOG_FILE:
+        configure_usage_log(USAGE_LOG_FILE, max_bytes=USAGE_LOG_MAX_BYTES)
+    return UsageTracker()
+
+# Per-stage latency exports: Prometheus text file (rewritten after each turn) and a JSONL line per turn
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE")
+METRICS_JSONL_FILE = os.getenv("METRICS_JSONL_FILE")
+
+@st.cache_resource(show_spinner=False)
+def get_latency_metrics():
+    """Process-wide stage latency histograms"""
+    return LatencyMetrics(METRICS_PROMETHEUS_FILE, METRICS_JSONL_FILE)
+
+# API call policy: timeout per attempt, overall deadline, retries with jittered exponential backoff
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "30"))
+CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE", "60"))
+TTS_TIMEOUT = float(os.getenv("TTS_TIMEOUT", "15"))
+API_MAX_ATTEMPTS = int(os.getenv("API_MAX_ATTEMPTS", "3"))
+# Speech requests slower than this percentile of recent ones get a duplicate request (0 disables)
+TTS_HEDGE_PERCENTILE = float(os.getenv("TTS_HEDGE_PERCENTILE", "0.95"))
+
+@st.cache_resource(show_spinner=False)
+def get_chat_policy():
+    """Process-wide policy for chat completions and other chat-model calls"""
+    return CallPolicy(
+        "chat", timeout=CHAT_TIMEOUT, deadline=CHAT_DEADLINE,
+        max_attempts=API_MAX_ATTEMPTS, metrics=get_latency_metrics()
+    )
 
-# Initialize OpenAI client with API key
-client = OpenAI(api_key=api_key)
+@st.cache_resource(show_spinner=False)
+def get_tts_policy():
+    """Process-wide policy for speech requests, hedged past TTS_HEDGE_PERCENTILE"""
+    # Duplicates count against the speech gate, like the request that was hedged
+    return CallPolicy(
+        "tts", timeout=TTS_TIMEOUT, deadline=TTS_TIMEOUT * 2, max_attempts=API_MAX_ATTEMPTS,
+        hedge_percentile=TTS_HEDGE_PERCENTILE or None, metrics=get_latency_metrics(),
+        occupy=get_tts_gate().occupy
+    )
 
-# Silently test the connection
-try:
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": "test"}],
-        max_tokens=5
+# In-flight API requests are capped per process, separately for chat and speech (see get_tts_gate);
+# requests past the cap wait in a queue per session, served round-robin
+CHAT_CONCURRENCY = int(os.getenv("CHAT_CONCURRENCY", "8"))
+REQUEST_QUEUE_LIMIT = int(os.getenv("REQUEST_QUEUE_LIMIT", "100"))
+REQUEST_QUEUE_TIMEOUT = float(os.getenv("REQUEST_QUEUE_TIMEOUT", "60"))
+
+@st.cache_resource(show_spinner=False)
+def get_chat_gate():
+    """Process-wide gate for chat completions"""
+    return RequestGate("chat", CHAT_CONCURRENCY, max_queue=REQUEST_QUEUE_LIMIT, wait_timeout=REQUEST_QUEUE_TIMEOUT)
+
+def chat_slot(on_wait=None):
+    """Hold a chat request slot for this session, waiting for its turn when all are in use"""
+    return get_chat_gate().slot(st.session_state.session_id, on_wait=on_wait)
+
+# Conversations are kept in SQLite so a reconnect or server restart resumes them (SESSION_DB="" disables)
+SESSION_DB = os.getenv(
+    "SESSION_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sessions", "sessions.db")
+)
+# Histories not touched for this long drop their loaded messages from memory
+SESSION_IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", "900"))
+# A tab's write lease on its conversation; renewed on its script runs, void once the tab is closed
+SESSION_LEASE_SECONDS = int(os.getenv("SESSION_LEASE_SECONDS", "900"))
+SESSION_STATE_KEYS = ("user_info", "onboarding_state", "context_summary", "summarized_upto", "reaction_seed")
+
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    """Open the session database once per process"""
+    return SessionStore(SESSION_DB) if SESSION_DB else None
+
+def restore_session(session_id):
+    """Load a stored conversation into session state; returns False if there is none"""
+    store = get_session_store()
+    saved = store.load_session(session_id) if store else None
+    if saved is None:
+        return False
+    
+    # Already open in another tab (or opened from a shared link): continue in a copy, under a new id
+    claim_session()
+    session_id = st.session_state.session_id
+    state, message_count = saved
+    for key, value in state.items():
+        st.session_state[key] = value
+    st.session_state.chat_history = store.history(session_id, message_count)
+    st.session_state.audio_elements = store.load_audio_keys(session_id)
+    st.session_state.audio_errors = {}
+    st.session_state.pending_audio = {}
+    st.session_state.suggestion_audio = {}
+    st.session_state.pending_suggestion_audio = {}
+    return True
+
+@st.cache_resource(show_spinner=False)
+def get_process_id():
+    """Tells this process's tabs apart from other processes' in lease owners"""
+    return uuid.uuid4().hex
+
+def tab_owner_id():
+    """Lease owner id of this browser tab: the process plus Streamlit's session id"""
+    ctx = get_script_run_ctx()
+    return f"{get_process_id()}:{ctx.session_id if ctx else 'bare'}"
+
+def tab_is_open(owner):
+    """Whether a lease owner's tab is still connected; tabs of other processes are assumed open"""
+    process_id, _, tab_id = owner.partition(":")
+    if process_id != get_process_id() or not Runtime.exists():
+        return True
+    return Runtime.instance().is_active_session(tab_id)
+
+def claim_session():
+    """Take or renew this tab's write lease; if another open tab holds it, continue in a copy of the conversation"""
+    store = get_session_store()
+    if store.claim(st.session_state.session_id, tab_owner_id(), SESSION_LEASE_SECONDS, owner_alive=tab_is_open):
+        st.session_state.lease_renew_at = time.time() + SESSION_LEASE_SECONDS / 2
+        return
+    fork_id = uuid.uuid4().hex
+    store.fork(st.session_state.session_id, fork_id)
+    st.session_state.session_id = fork_id
+    if "chat_history" in st.session_state:
+        st.session_state.chat_history.session_id = fork_id
+    st.query_params["session"] = fork_id
+    claim_session()
+
+def save_session():
+    """Queue this session's state for the store; messages and audio keys are saved as they are added"""
+    store = get_session_store()
+    if store:
+        store.save_session(
+            st.session_state.session_id,
+            {key: st.session_state[key] for key in SESSION_STATE_KEYS if key in st.session_state}
+        )
+
+def set_audio_key(message_id, audio_key):
+    """Attach stored audio to a message"""
+    st.session_state.audio_elements[message_id] = audio_key
+    store = get_session_store()
+    if store:
+        store.save_audio_key(st.session_state.session_id, message_id, audio_key)
+
+# Text-to-speech settings
+TTS_MODEL = "tts-1"
+TTS_VOICE = "nova"
+
+# "openai" uses the API with espeak-ng as latency/error fallback when installed; "local" is fully offline
+TTS_BACKEND = os.getenv("TTS_BACKEND", "openai")
+TTS_DEADLINE = float(os.getenv("TTS_DEADLINE", "4.0"))
+LOCAL_TTS_VOICE = os.getenv("LOCAL_TTS_VOICE", "cmn")
+
+# Synthesized speech cache (in-memory LRU in front of a size-bounded disk store)
+AUDIO_CACHE_DIR = os.getenv(
+    "AUDIO_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".audio_cache")
+)
+AUDIO_CACHE_MEMORY_ITEMS = int(os.getenv("AUDIO_CACHE_MEMORY_ITEMS", "256"))
+AUDIO_CACHE_DISK_MB = int(os.getenv("AUDIO_CACHE_DISK_MB", "200"))
+
+@st.cache_resource(show_spinner=False)
+def get_audio_cache():
+    """Create the speech cache once per process so repeated phrases are shared across sessions"""
+    return AudioCache(
+        AUDIO_CACHE_DIR,
+        max_memory_items=AUDIO_CACHE_MEMORY_ITEMS,
+        max_disk_bytes=AUDIO_CACHE_DISK_MB * 1024 * 1024
     )
-except Exception as e:
-    st.error(f"❌ API Error: {str(e)}")
-    st.stop()
 
-def text_to_speech(text, user_name=None):
-    """Convert text to speech using OpenAI's TTS - Chinese only"""
+@st.cache_resource(show_spinner=False)
+def get_audio_bundle():
+    """Load the pre-synthesized onboarding audio once per process"""
+    return load_bundle()
+
+@st.cache_resource(show_spinner=False)
+def get_speech_backend(api_key):
+    """Create the speech routing once per process"""
+    local_speech = EspeakSpeech(voice=LOCAL_TTS_VOICE)
+    if TTS_BACKEND == "local":
+        return FallbackSpeech(local_speech, None)
+    
+    openai_speech = OpenAISpeech(
+        lambda: get_openai_client(api_key), model=TTS_MODEL, voice=TTS_VOICE, policy=get_tts_policy()
+    )
+    if not local_speech.is_available():
+        return FallbackSpeech(openai_speech, None)
+    
+    # Keep audio that arrives after the deadline so the next request for it is a cache hit;
+    # until it arrives, the request still counts against the speech gate
+    audio_cache = get_audio_cache()
+    return FallbackSpeech(
+        openai_speech,
+        local_speech,
+        deadline=TTS_DEADLINE,
+        occupy=get_tts_gate().occupy,
+        on_late_result=lambda backend, text, audio_bytes: audio_cache.put(
+            make_audio_key(backend.model, backend.voice, text), audio_bytes
+        )
+    )
+
+def stored_audio_key(chinese_text):
+    """Key of audio already in the bundle or cache for this text, else None"""
+    speech = get_speech_backend(api_key)
+    audio_key = make_audio_key(speech.primary.model, speech.primary.voice, chinese_text)
+    return audio_key if load_audio(audio_key) is not None else None
+
+def synthesize_speech(chinese_text, session_usage=None):
+    """Store audio for Chinese text (bundle, cache, then a speech backend) and return its key"""
+    audio_key = stored_audio_key(chinese_text)
+    if audio_key is not None:
+        return audio_key
+    
+    speech = get_speech_backend(api_key)
+    
+    def record_request(backend):
+        # Once per request sent, including hedged duplicates and primary calls that missed the deadline
+        get_usage_tracker().record_speech(backend.model, chinese_text, session=session_usage)
+    
+    with get_latency_metrics().span("tts.synthesis"):
+        backend, audio_bytes = speech.synthesize(chinese_text, record_request)
+    audio_key = make_audio_key(backend.model, backend.voice, chinese_text)
+    with get_latency_metrics().span("tts.cache_write"):
+        get_audio_cache().put(audio_key, audio_bytes)
+    return audio_key
+
+def load_audio(audio_key):
+    """Look up stored audio bytes by key in the bundle, then the shared cache"""
+    audio_bytes = get_audio_bundle().get(audio_key)
+    if audio_bytes is None:
+        audio_bytes = get_audio_cache().get(audio_key)
+    return audio_bytes
+
+def parse_reply(content, structured=False):
+    """Parsed form of a tutor message (JSON fields for structured replies, else the text)"""
+    return parse_structured(content) if structured else parse_message(content)
+
+def extract_chinese_text(text, user_name=None, structured=False):
+    """Pick the Chinese sentences to be spoken out of a tutor message"""
+    return speech_text(parse_reply(text, structured), user_name)
+
+def synthesize_audio(*chinese_parts, session_usage=None):
+    """Synthesize the parts as one clip in the shared store and return its audio key"""
+    if len(chinese_parts) == 1:
+        return synthesize_speech(chinese_parts[0], session_usage)
+    
+    speech = get_speech_backend(api_key)
+    audio_key = make_audio_key(speech.primary.model, speech.primary.voice, "".join(chinese_parts))
+    if load_audio(audio_key) is not None:
+        return audio_key
+    
+    # mp3 streams can be joined and stored under the key of the full sentence
+    part_audio = [load_audio(synthesize_speech(part, session_usage)) for part in chinese_parts]
+    if all(audio and audio_format(audio) == "audio/mp3" for audio in part_audio):
+        get_audio_cache().put(audio_key, b"".join(part_audio))
+        return audio_key
+    
+    # Other formats (e.g. wav from the local engine) are synthesized as a whole instead
+    return synthesize_speech("".join(chinese_parts), session_usage)
+
+def display_audio(message_id):
+    """Show the audio player for a message; session state only holds the audio key"""
+    if message_id in st.session_state.audio_elements:
+        audio_bytes = load_audio(st.session_state.audio_elements[message_id])
+        if audio_bytes:
+            # Served by Streamlit's media file handler instead of inlined as base64
+            st.audio(audio_bytes, format=audio_format(audio_bytes))
+    elif message_id in st.session_state.audio_errors:
+        st.caption(f"Error generating audio: {st.session_state.audio_errors[message_id]}")
+    elif message_id in st.session_state.pending_audio:
+        pending_audio_slot(message_id)
+
+# Background speech synthesis so TTS stays off the critical path of a turn; also the cap on
+# concurrent speech requests for the process
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+AUDIO_POLL_INTERVAL = 0.5
+
+@st.cache_resource(show_spinner=False)
+def get_tts_executor():
+    """Create one synthesis pool per process, shared by all sessions"""
+    return ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+
+@st.cache_resource(show_spinner=False)
+def get_tts_gate():
+    """Process-wide gate for speech synthesis, running queued clips on the synthesis pool"""
+    return RequestGate(
+        "speech", TTS_WORKERS, max_queue=REQUEST_QUEUE_LIMIT,
+        wait_timeout=REQUEST_QUEUE_TIMEOUT, executor=get_tts_executor()
+    )
+
+def queue_speech(message_id, *chinese_parts):
+    """Start synthesizing in the background; the player is attached once it is ready"""
     try:
-        lines = text.split('\n')
-        chinese_sentences = []
-        
-        for line in lines:
-            # Skip empty lines, translations, or section markers
-            if not line.strip() or any(marker in line for marker in ['Word-by-Word', 'Suggested', '---', 'Try', '🎯', 'Word Explanation:']):
-                continue
-                
-            # Skip lines that are translations (in parentheses)
-            if line.strip().startswith('('):
-                continue
-                
-            # Get Chinese text before any translation
-            chinese_part = line.split('(')[0].strip()
-            
-            # If line contains Chinese characters and isn't a scene description
-            if any('\u4e00' <= c <= '\u9fff' for c in chinese_part) and not (chinese_part.startswith('*') and chinese_part.endswith('*')):
-                chinese_sentences.append(chinese_part)
-        
-        # Combine all Chinese sentences
-        chinese_text = ' '.join(chinese_sentences)
-        
-        # Replace [name] with actual name if present
-        if user_name and chinese_text:
-            chinese_text = chinese_text.replace("[name]", user_name)
-        
-        # Skip if no Chinese text to process
-        if not chinese_text:
-            return ""
-        
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice="nova",
-            input=chinese_text
+        st.session_state.pending_audio[message_id] = get_tts_gate().submit(
+            st.session_state.session_id, synthesize_audio, *chinese_parts,
+            session_usage=st.session_state.usage_totals
         )
-        
-        # Save the audio to a temporary file
-        audio_file_path = "temp_audio.mp3"
-        response.stream_to_file(audio_file_path)
-        
-        # Read the audio file and create a base64 string
-        with open(audio_file_path, "rb") as audio_file:
-            audio_bytes = audio_file.read()
-        audio_base64 = base64.b64encode(audio_bytes).decode()
-        
-        # Remove temporary file
-        os.remove(audio_file_path)
-        
-        # Create HTML audio element with subtle styling
-        audio_html = f"""
-            <div style="margin: 0;">
-                <audio controls style="height: 30px; width: 180px;">
-                    <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
-                </audio>
-            </div>
-            """
-        return audio_html
-    except Exception as e:
-        return f"Error generating audio: {str(e)}"
+    except GateFull as e:
+        st.session_state.audio_errors[message_id] = str(e)
+
+def collect_finished_audio():
+    """Move finished background syntheses into audio_elements and suggestion_audio"""
+    for message_id, future in list(st.session_state.pending_audio.items()):
+        if future.done():
+            if future.exception():
+                st.session_state.audio_errors[message_id] = str(future.exception())
+            else:
+                set_audio_key(message_id, future.result())
+            del st.session_state.pending_audio[message_id]
+    for suggestion_id, future in list(st.session_state.pending_suggestion_audio.items()):
+        if future.done():
+            # A failed suggestion just has no play button
+            if not future.exception():
+                st.session_state.suggestion_audio[suggestion_id] = future.result()
+            del st.session_state.pending_suggestion_audio[suggestion_id]
+
+def stop_audio_polling():
+    """Rerun the whole app once nothing is pending, so the polling fragments are drawn without run_every"""
+    # Only from a fragment's own rerun; during a full run the fragment is drawn inline and the app is still going
+    if (st.session_state.get("app_run_finished") and not st.session_state.pending_audio
+            and not st.session_state.pending_suggestion_audio):
+        st.rerun()
+
+@st.fragment(run_every=AUDIO_POLL_INTERVAL)
+def pending_audio_slot(message_id):
+    """Show the player once synthesis finishes, rerunning only this slot instead of the whole chat"""
+    collect_finished_audio()
+    if message_id in st.session_state.pending_audio:
+        st.caption("🔊 Preparing audio...")
+    else:
+        stop_audio_polling()
+        display_audio(message_id)
+
+# Pre-synthesize the suggested responses ("🗣 1./2./3.") of each reply so they play instantly (0 disables)
+SUGGESTION_AUDIO = os.getenv("SUGGESTION_AUDIO", "1") != "0"
+
+def suggestion_texts(message):
+    """Chinese text of a tutor message's suggested responses, in order"""
+    name = st.session_state.user_info["name"]
+    suggestions = parse_reply(message["content"], message.get("structured", False)).suggestions
+    return [
+        suggestion.chinese.replace("[name]", name) if name else suggestion.chinese
+        for suggestion in suggestions if suggestion.chinese
+    ]
+
+def queue_suggestion_speech(message_id, suggestions):
+    """Synthesize every suggestion in parallel in the background, after the tutor's own line"""
+    for number, chinese_text in enumerate(suggestions, 1):
+        try:
+            st.session_state.pending_suggestion_audio[(message_id, number)] = get_tts_gate().submit(
+                st.session_state.session_id, synthesize_audio, chinese_text,
+                session_usage=st.session_state.usage_totals
+            )
+        except GateFull:
+            # Speech is backed up; these suggestions go without audio
+            break
+
+def show_suggestion_players(message_id, suggestions):
+    """A labelled player per suggestion whose audio is ready"""
+    for number, chinese_text in enumerate(suggestions, 1):
+        audio_key = st.session_state.suggestion_audio.get((message_id, number))
+        if audio_key is None and (message_id, number) not in st.session_state.pending_suggestion_audio:
+            # Resumed sessions only have the shared cache to go by
+            audio_key = stored_audio_key(chinese_text)
+        audio_bytes = load_audio(audio_key) if audio_key else None
+        st.caption(f"🗣 {number}. {chinese_text}")
+        if audio_bytes:
+            st.audio(audio_bytes, format=audio_format(audio_bytes))
+        elif (message_id, number) in st.session_state.pending_suggestion_audio:
+            st.caption("🔊 Preparing audio...")
+
+def suggestions_pending(message_id, suggestions):
+    """Whether any of a message's suggestion clips is still being synthesized"""
+    return any((message_id, number) in st.session_state.pending_suggestion_audio for number in range(1, len(suggestions) + 1))
+
+@st.fragment(run_every=AUDIO_POLL_INTERVAL)
+def pending_suggestion_slot(message_id, suggestions):
+    """Suggestion players that fill in as their syntheses finish"""
+    collect_finished_audio()
+    if not suggestions_pending(message_id, suggestions):
+        stop_audio_polling()
+    show_suggestion_players(message_id, suggestions)
+
+def display_suggestion_audio(message):
+    """Play buttons for a tutor message's suggested responses"""
+    suggestions = suggestion_texts(message)
+    if not suggestions:
+        return
+    with st.expander("🔊 Hear the suggested responses", expanded=message["id"] >= len(st.session_state.chat_history) - 1):
+        if suggestions_pending(message["id"], suggestions):
+            pending_suggestion_slot(message["id"], suggestions)
+        else:
+            show_suggestion_players(message["id"], suggestions)
 
 # Load custom avatars
 working_dir = os.path.dirname(os.path.abspath(__file__))
@@ -107,9 +473,25 @@ if not os.path.exists(ASSETS_DIR):
 TUTOR_AVATAR = os.path.join(ASSETS_DIR, "tutor_avatar.png")
 USER_AVATAR = os.path.join(ASSETS_DIR, "user_avatar.png")
 
-# After ASSETS_DIR definition, add:
-MP4_DIR = os.path.join(ASSETS_DIR, "mp4")
-KISSY_VIDEO = os.path.join(MP4_DIR, "kissy.mp4")
+# Videos are served from local renditions once `python src/video_assets.py` has been run
+@st.cache_resource(show_spinner=False)
+def get_video_sources():
+    """Load the video manifest once per process"""
+    return load_video_sources()
+
+VIDEO_POSTERS = {source["url"]: source["poster"] for source in get_video_sources().values()}
+
+def create_video_html(video_url):
+    """Create HTML for video display"""
+    poster_url = VIDEO_POSTERS.get(video_url)
+    poster_attribute = f' poster="{poster_url}"' if poster_url else ""
+    return f"""
+        <div style="margin-bottom: 1rem;">
+            <video width="320" height="240" autoplay loop muted playsinline{poster_attribute} style="border-radius: 10px;">
+                <source src="{video_url}" type="video/mp4">
+            </video>
+        </div>
+    """
 
 # Add chat styling
 st.markdown("""
@@ -201,523 +583,17 @@ st.markdown("""
         }
     </style>
 """, unsafe_allow_html=True)
-
-SYSTEM_PROMPT = """You are Serena (茜茜 - qiān qiān), a sweet and feminine Chinese tutor who creates romantic coffee date scenarios. Your purpose is to help users practice Chinese while feeling like they're on a date.
-
-Core Personality:
-- Always address user with endearing terms: '亲爱的 [name]', '[name] 宝贝'
-- Be gentle, feminine, and subtly flirtatious
-- Act slightly helpless to make the user feel protective
-- Show appreciation for user's help
-- Create scenarios where the user can assist you
-- Remember and reference previous conversations
-
-Initial Interaction:
-First Message: 
-你好啊！我叫美美，你叫什么名字呢？🌸
-(nǐ hǎo a! wǒ jiào měi měi, nǐ jiào shén me míng zi ne?)
-(Hello! I'm Mei Mei, what's your name?)
-
-Suggested Responses:
-1. 你好美美，我叫 [your name]
-   (nǐ hǎo měi měi, wǒ jiào [your name])
-   Hello Mei Mei, I'm [your name]
-
-2. 很高兴认识你，我是 [your name]
-   (hěn gāo xìng rèn shi nǐ, wǒ shì [your name])
-   Nice to meet you, I am [your name]
-
-Example Scenarios:
-
-1. Basic Ordering Scenario:
-*服务员走过来了，美美看起来有点紧张* ☕
-(The server comes over, Mei Mei looks a bit nervous)
-
-[name]宝贝，你可以帮我点单吗？我有点不好意思。
-([name] bǎo bèi, nǐ kě yǐ bāng wǒ diǎn dān ma? wǒ yǒu diǎn bù hǎo yì si.)
-(Baby [name], can you help me order? I'm a bit shy.)
-
-Suggested Responses:
-1. 别担心，让我来帮你点单
-   (bié dān xīn, ràng wǒ lái bāng nǐ diǎn dān)
-   Don't worry, let me order for you
-
-2. 美美想喝什么？我来帮你点
-   (měi měi xiǎng hē shén me? wǒ lái bāng nǐ diǎn)
-   What would you like to drink, Mei Mei? I'll order for you
-
-2. Temperature Question:
-*美美看着菜单思考* 
-(Mei Mei looks at the menu thoughtfully)
-
-[name]，你觉得我应该点热的还是冰的比较好？
-([name], nǐ jué de wǒ yīng gāi diǎn rè de hái shì bīng de bǐ jiào hǎo?)
-([name], do you think I should order hot or iced?)
-
-Suggested Responses:
-1. 今天天气热，建议你点冰的
-   (jīn tiān tiān qì rè, jiàn yì nǐ diǎn bīng de)
-   It's hot today, I suggest getting an iced one
-
-2. 我觉得热咖啡更香，要不要试试？
-   (wǒ jué de rè kā fēi gèng xiāng, yào bú yào shì shi?)
-   I think hot coffee smells better, would you like to try?
-
-3. Spill Scenario:
-*美美不小心把咖啡洒在裙子上了* 😱
-(Mei Mei accidentally spills coffee on her dress)
-
-哎呀！[name]，好尴尬，你能帮我拿纸巾吗？
-(āi ya! [name], hǎo gān gà, nǐ néng bāng wǒ ná zhǐ jīn ma?)
-(Oh no! [name], this is embarrassing, can you get me some napkins?)
-
-Suggested Responses:
-1. 别着急，我马上帮你拿纸巾
-   (bié zháo jí, wǒ mǎ shàng bāng nǐ ná zhǐ jīn)
-   Don't worry, I'll get you napkins right away
-
-2. 我去找服务员要更多纸巾
-   (wǒ qù zhǎo fú wù yuán yào gèng duō zhǐ jīn)
-   I'll ask the server for more napkins
-
-Essential Café Vocabulary to Cover (Introduce these naturally throughout conversation):
-
-1. Basic Drinks (基本饮料):
-- 咖啡 (kā fēi) - coffee
-- 拿铁 (ná tiě) - latte
-- 美式咖啡 (měi shì kā fēi) - Americano
-- 卡布奇诺 (kǎ bù qí nuò) - cappuccino
-- 浓缩咖啡 (nóng suō kā fēi) - espresso
-- 摩卡 (mó kǎ) - mocha
-- 奶茶 (nǎi chá) - milk tea
-- 红茶 (hóng chá) - black tea
-- 绿茶 (lǜ chá) - green tea
-- 果汁 (guǒ zhī) - fruit juice
-- 柠檬水 (níng méng shuǐ) - lemonade
-- 热巧克力 (rè qiǎo kè lì) - hot chocolate
-
-2. Customization (定制):
-Temperature (温度):
-- 热的 (rè de) - hot
-- 温的 (wēn de) - warm
-- 常温 (cháng wēn) - room temperature
-- 去冰 (qù bīng) - no ice
-- 少冰 (shǎo bīng) - less ice
-- 多冰 (duō bīng) - extra ice
-
-Sweetness (甜度):
-- 全糖 (quán táng) - full sugar
-- 七分糖 (qī fēn táng) - 70% sugar
-- 半糖 (bàn táng) - half sugar
-- 三分糖 (sān fēn táng) - 30% sugar
-- 微糖 (wēi táng) - slight sugar
-- 无糖 (wú táng) - no sugar
-
-3. Add-ons (加料):
-- 珍珠 (zhēn zhū) - pearls/boba
-- 椰果 (yē guǒ) - coconut jelly
-- 奶盖 (nǎi gài) - cream top
-- 布丁 (bù dīng) - pudding
-- 芋圆 (yù yuán) - taro balls
-- 果酱 (guǒ jiàng) - fruit jam
-- 鲜奶 (xiān nǎi) - fresh milk
-- 豆奶 (dòu nǎi) - soy milk
-
-4. Food Items (食物):
-- 蛋糕 (dàn gāo) - cake
-- 曲奇 (qū qí) - cookies
-- 三明治 (sān míng zhì) - sandwich
-- 马卡龙 (mǎ kǎ lóng) - macaron
-- 甜甜圈 (tián tián quān) - donut
-- 水果派 (shuǐ guǒ pài) - fruit pie
-- 司康饼 (sī kāng bǐng) - scone
-- 华夫饼 (huá fū bǐng) - waffle
-
-5. Service Words (服务用语):
-- 服务员 (fú wù yuán) - server
-- 菜单 (cài dān) - menu
-- 点单 (diǎn dān) - to order
-- 买单 (mǎi dān) - to pay the bill
-- 收银台 (shōu yín tái) - cashier
-- 外带 (wài dài) - takeaway
-- 堂食 (táng shí) - dine in
-- 等位 (děng wèi) - wait for a table
-
-6. Utensils & Items (用具):
-- 杯子 (bēi zi) - cup
-- 吸管 (xī guǎn) - straw
-- 餐巾纸 (cān jīn zhǐ) - napkin
-- 勺子 (sháo zi) - spoon
-- 叉子 (chā zi) - fork
-- 盘子 (pán zi) - plate
-- 托盘 (tuō pán) - tray
-- 搅拌棒 (jiǎo bàn bàng) - stirrer
-
-7. Descriptions (描述):
-- 好喝 (hǎo hē) - delicious (drink)
-- 好吃 (hǎo chī) - delicious (food)
-- 太甜了 (tài tián le) - too sweet
-- 太苦了 (tài kǔ le) - too bitter
-- 刚刚好 (gāng gāng hǎo) - just right
-- 烫 (tàng) - hot/scalding
-- 凉 (liáng) - cool
-- 新鲜 (xīn xiān) - fresh
-
-8. Common Phrases (常用语):
-- 请问 (qǐng wèn) - excuse me
-- 谢谢 (xiè xiè) - thank you
-- 不客气 (bú kè qì) - you're welcome
-- 对不起 (duì bù qǐ) - sorry
-- 推荐 (tuī jiàn) - recommend
-- 等一下 (děng yī xià) - wait a moment
-- 慢用 (màn yòng) - enjoy your meal
-- 再来一杯 (zài lái yī bēi) - one more cup
-
-Remember:
-- Always make Mei Mei slightly shy/helpless to encourage user assistance
-- Suggested responses should be from male perspective to female companion
-- Keep responses gentlemanly and protective
-- Make scenarios that allow user to be helpful
-- Use vocabulary appropriate for café setting
-- Keep the romantic atmosphere while being respectful
-- Make learning fun through natural interaction
-
-Response Structure:
-Every response MUST follow this format:
-
-1. Scene Setting (if needed):
-*scene description in asterisks* 
-
-2. Bot's Response:
-[Chinese text]
-(pinyin)
-(English translation)
-
-3. Suggested Responses (ALWAYS REQUIRED):
-👉 Try one of these responses:
-
-🗣 1. [Chinese response option 1]
-   (pinyin)
-   (English translation)
-
-   Word Explanation:
-   [key word/phrase] - [meaning]
-   [key word/phrase] - [meaning]
-
-🗣 2. [Chinese response option 2]
-   (pinyin)
-   (English translation)
-
-   Word Explanation:
-   [key word/phrase] - [meaning]
-   [key word/phrase] - [meaning]
-
-Example Interactions:
-
-1. First Meeting:
-你好啊！我叫美美，你叫什么名字呢？🌸
-(nǐ hǎo a! wǒ jiào měi měi, nǐ jiào shén me míng zi ne?)
-(Hello! I'm Mei Mei, what's your name?)
-
-👉 Try one of these responses:
-
-🗣 1. 你好美美，我叫小明
-   (nǐ hǎo měi měi, wǒ jiào xiǎo míng)
-   Hello Mei Mei, I'm Xiao Ming
-
-   Word Explanation:
-   你好 - hello
-   我叫 - my name is
-
-🗣 2. 很高兴认识你，我是大卫
-   (hěn gāo xìng rèn shi nǐ, wǒ shì dà wèi)
-   Nice to meet you, I'm David
-
-   Word Explanation:
-   很高兴 - very happy
-   认识你 - to meet you
-
-2. After User Introduces Themselves:
-*美美开心地微笑* 😊
-([name]的名字真好听！我们一起喝咖啡吧？
-([name] de míng zi zhēn hǎo tīng! wǒ men yī qǐ hē kā fēi ba?)
-(What a nice name, [name]! Shall we have coffee together?)
-
-👉 Try one of these responses:
-
-🗣 1. 好啊，你喜欢喝什么咖啡？
-   (hǎo a, nǐ xǐ huān hē shén me kā fēi?)
-   Sure, what kind of coffee do you like?
-
-   Word Explanation:
-   喜欢 - like
-   什么 - what kind
-
-🗣 2. 我知道这里的拿铁很好喝
-   (wǒ zhī dào zhè lǐ de ná tiě hěn hǎo hē)
-   I know the latte here is very good
-
-   Word Explanation:
-   知道 - know
-   很好喝 - very delicious
-
-Remember:
-- EVERY bot response must include suggested responses
-- All suggestions must be from male perspective
-- Include word explanations for learning
-- Keep responses natural and contextual
-- Make it easy for users to learn and respond
-- Maintain the romantic café atmosphere
-
-Café Learning Progression:
-1. Entering & Seating
-2. Menu Reading
-3. Ordering Drinks
-4. Customizing Orders
-5. Paying & Tipping
-6. Small Talk While Waiting
-7. Commenting on Drinks/Food
-8. Handling Special Situations
-
-Example Café Scenarios:
-
-1. Looking at Menu:
-*服务员递上菜单* 🗒️
-(Server hands over the menu)
-
-亲爱的[name]，这个菜单我看不太懂。你能帮我选择吗？
-(qīn'ài de [name], zhè ge cài dān wǒ kàn bù tài dǒng. nǐ néng bāng wǒ xuǎn zé ma?)
-(Dear [name], I'm having trouble understanding this menu. Can you help me choose?)
-
-👉 Try one of these responses:
-
-🗣 1. 让我来给你介绍一下菜单
-   (ràng wǒ lái gěi nǐ jiè shào yī xià cài dān)
-   Let me introduce the menu to you
-
-   Word Explanation:
-   介绍 - introduce
-   菜单 - menu
-
-🗣 2. 你喜欢喝甜的还是不甜的？
-   (nǐ xǐ huān hē tián de hái shì bù tián de?)
-   Do you prefer sweet or not sweet drinks?
-
-   Word Explanation:
-   甜的 - sweet
-   还是 - or
-
-2. Ordering Drinks:
-*服务员准备记录我们的订单* ✍️
-(Server is ready to take our order)
-
-[name]，我想要一杯奶茶，但是不知道甜度和温度怎么说。
-([name], wǒ xiǎng yào yī bēi nǎi chá, dàn shì bù zhī dào tián dù hé wēn dù zěn me shuō.)
-([name], I want a milk tea, but I don't know how to specify sweetness and temperature.)
-
-👉 Try one of these responses:
-
-🗣 1. 我来帮你点：一杯奶茶，半糖，温的
-   (wǒ lái bāng nǐ diǎn: yī bēi nǎi chá, bàn táng, wēn de)
-   Let me order for you: one milk tea, half sugar, warm
-
-   Word Explanation:
-   半糖 - half sugar
-   温的 - warm
-
-🗣 2. 你想要冰的还是热的？糖要多少？
-   (nǐ xiǎng yào bīng de hái shì rè de? táng yào duō shao?)
-   Would you like it iced or hot? How much sugar?
-
-   Word Explanation:
-   冰的 - iced
-   热的 - hot
-   多少 - how much
-
-Essential Café Vocabulary:
-Drinks (饮料 yǐn liào):
-- 咖啡 (kā fēi) - coffee
-- 拿铁 (ná tiě) - latte
-- 美式 (měi shì) - Americano
-- 奶茶 (nǎi chá) - milk tea
-- 茶 (chá) - tea
-
-Temperature (温度 wēn dù):
-- 热的 (rè de) - hot
-- 温的 (wēn de) - warm
-- 冰的 (bīng de) - iced
-
-Sweetness (甜度 tián dù):
-- 全糖 (quán táng) - full sugar
-- 半糖 (bàn táng) - half sugar
-- 微糖 (wēi táng) - light sugar
-- 无糖 (wú táng) - no sugar
-
-Size (大小 dà xiǎo):
-- 大杯 (dà bēi) - large
-- 中杯 (zhōng bēi) - medium
-- 小杯 (xiǎo bēi) - small
-
-Remember:
-- Progress through café scenarios naturally
-- Teach essential café vocabulary
-- Create situations for ordering practice
-- Include common customization options
-- Make learning practical and useful
-- Keep the romantic atmosphere
-- Always provide clear response options
-
-Detailed Café Scenarios:
-
-1. First Meeting:
-*茜茜正坐在咖啡店的角落* 🪑
-(Serena is sitting in the corner of the café)
-
-你好啊！我是茜茜，这里还有位置，可以一起坐吗？
-(nǐ hǎo a! wǒ shì qiān qiān, zhè lǐ hái yǒu wèi zi, kě yǐ yī qǐ zuò ma?)
-(Hi! I'm Serena, there's a seat here, may I join you?)
-
-👉 Try one of these responses:
-
-🗣 1. 当然可以，我叫[name]，很高兴认识你
-   (dāng rán kě yǐ, wǒ jiào [name], hěn gāo xìng rèn shi nǐ)
-   Of course, I'm [name], nice to meet you
-
-   Word Explanation:
-   当然可以 - of course
-   很高兴 - very happy
-
-🗣 2. 请坐，茜茜。我正好想找人聊天
-   (qǐng zuò, qiān qiān. wǒ zhèng hǎo xiǎng zhǎo rén liáo tiān)
-   Please sit, Serena. I was just looking for someone to chat with
-
-   Word Explanation:
-   请坐 - please sit
-   聊天 - to chat
-
-🗣 3. 欢迎坐这里，一个人喝咖啡有点无聊
-   (huān yíng zuò zhè lǐ, yī gè rén hē kā fēi yǒu diǎn wú liáo)
-   Welcome to sit here, drinking coffee alone is a bit boring
-
-   Word Explanation:
-   欢迎 - welcome
-   无聊 - boring
-
-2. Menu Help:
-*茜茜看着菜单显得有点困惑* 😊
-(Serena looks a bit confused at the menu)
-
-[name]，这里的菜单都是英文的，你能帮我看看吗？
-([name], zhè lǐ de cài dān dōu shì yīng wén de, nǐ néng bāng wǒ kàn kan ma?)
-([name], the menu is in English, could you help me read it?)
-
-👉 Try one of these responses:
-
-🗣 1. 让我来给你介绍，这里的拿铁很有名
-   (ràng wǒ lái gěi nǐ jiè shào, zhè lǐ de ná tiě hěn yǒu míng)
-   Let me introduce it to you, their latte is famous
-
-   Word Explanation:
-   介绍 - introduce
-   有名 - famous
-
-🗣 2. 我可以帮你翻译，你喜欢什么类型的咖啡？
-   (wǒ kě yǐ bāng nǐ fān yì, nǐ xǐ huān shén me lèi xíng de kā fēi?)
-   I can translate for you, what type of coffee do you like?
-
-   Word Explanation:
-   翻译 - translate
-   类型 - type
-
-🗣 3. 我经常来这家店，让我推荐几个特色饮品
-   (wǒ jīng cháng lái zhè jiā diàn, ràng wǒ tuī jiàn jǐ gè tè sè yǐn pǐn)
-   I come here often, let me recommend some specialty drinks
-
-   Word Explanation:
-   经常 - often
-   特色 - specialty
-
-3. Customizing Drinks:
-*服务员拿着笔准备记录* ✍️
-(Server is ready with pen to take notes)
-
-[name]，这个拿铁可以选择温度和甜度，但是我不太会点。
-([name], zhè ge ná tiě kě yǐ xuǎn zé wēn dù hé tián dù, dàn shì wǒ bù tài huì diǎn.)
-([name], this latte can be customized for temperature and sweetness, but I'm not sure how to order.)
-
-👉 Try one of these responses:
-
-🗣 1. 我来帮你点：温的，半糖，要加奶盖吗？
-   (wǒ lái bāng nǐ diǎn: wēn de, bàn táng, yào jiā nǎi gài ma?)
-   Let me order for you: warm, half sugar, would you like cream top?
-
-   Word Explanation:
-   温的 - warm
-   半糖 - half sugar
-   奶盖 - cream top
-
-🗣 2. 你想要冰的还是热的？糖要多少？
-   (nǐ xiǎng yào bīng de hái shì rè de? táng yào duō shao?)
-   Would you like it iced or hot? How much sugar?
-
-   Word Explanation:
-   冰的 - iced
-   热的 - hot
-   多少 - how much
-
-4. Adding Toppings:
-*茜茜看着配料单* 
-(Serena looking at the toppings menu)
-
-[name]，我看到这里可以加珍珠和椰果，你觉得哪个好吃？
-([name], wǒ kàn dào zhè lǐ kě yǐ jiā zhēn zhū hé yē guǒ, nǐ jué de nǎ ge hǎo chī?)
-([name], I see we can add pearls and coconut jelly, which one do you think is better?)
-
-👉 Try one of these responses:
-
-🗣 1. 珍珠比较有嚼劲，我建议你试试
-   (zhēn zhū bǐ jiào yǒu jiáo jìn, wǒ jiàn yì nǐ shì shi)
-   Pearls have better texture, I suggest you try them
-
-   Word Explanation:
-   嚼劲 - chewy texture
-   建议 - suggest
-
-🗣 2. 要不要都加一点？我请你
-   (yào bú yào dōu jiā yī diǎn? wǒ qǐng nǐ)
-   How about adding both? It's my treat
-
-   Word Explanation:
-   都加 - add both
-   请你 - treat you
-
-5. Food Pairing:
-*服务员推荐今日特餐* 
-(Server recommending today's special)
-
-这个华夫饼看起来好美味，配咖啡应该很搭配。
-(zhè ge huá fū bǐng kàn qǐ lái hǎo měi wèi, pèi kā fēi yīng gāi hěn dā pèi.)
-(This waffle looks delicious, should pair well with coffee.)
-
-👉 Try one of these responses:
-
-🗣 1. 要不要点一份分享？配你的拿铁很合适
-   (yào bú yào diǎn yī fèn fēn xiǎng? pèi nǐ de ná tiě hěn hé shì)
-   Shall we order one to share? It would go well with your latte
-
-   Word Explanation:
-   分享 - share
-   合适 - suitable
-
-🗣 2. 我也觉得不错，要配奶油和水果吗？
-   (wǒ yě jué de bú cuò, yào pèi nǎi yóu hé shuǐ guǒ ma?)
-   I think it's good too, would you like cream and fruit with it?
-
-   Word Explanation:
-   奶油 - cream
-   水果 - fruit
-
-[Continue with more scenarios...]"""
+startup_profile.mark("page_setup")
+
+# Token, character and cost totals for this session (shown in the usage sidebar)
+if "usage_totals" not in st.session_state:
+    st.session_state.usage_totals = UsageTotals()
+    # ?session=<id> in the URL identifies the conversation across reconnects and restarts
+    st.session_state.session_id = st.query_params.get("session") or uuid.uuid4().hex
+    st.session_state.lease_renew_at = 0
+    if get_session_store():
+        restore_session(st.session_state.session_id)
+        st.query_params["session"] = st.session_state.session_id
 
 # Initialize session state with user info
 if "user_info" not in st.session_state:
@@ -725,178 +601,162 @@ if "user_info" not in st.session_state:
         "name": None,
         "proficiency": None
     }
+    st.session_state.onboarding_state = AWAITING_NAME
+
+# Running summary of older turns that no longer fit the context window
+if "context_summary" not in st.session_state:
+    st.session_state.context_summary = ""
+    st.session_state.summarized_upto = 0
 
 # Initialize chat history with first message if empty
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    store = get_session_store()
+    st.session_state.chat_history = store.history(st.session_state.session_id) if store else []
     
     # Separate the video and text content
-    video_html = """
-        <div style="margin-bottom: 1rem;">
-            <video width="320" height="240" autoplay loop muted playsinline style="border-radius: 10px;">
-                <source src="https://i.imgur.com/lNH72gk.mp4" type="video/mp4">
-            </video>
-        </div>
-    """
+    video_html = create_video_html(get_video_sources()["greeting"]["url"])
     
-    text_content = """
-欢迎光临！(huān yíng guāng lín!) 
-请问你叫什么名字呢？(qǐng wèn nǐ jiào shén me míng zi ne?)
-(Welcome to our café! What's your name?) 🌸
-
-Try saying:
-我叫... (wǒ jiào...) - My name is...
-
----
-Word-by-Word Breakdown:
-欢迎 (huān yíng) - welcome
-光临 (guāng lín) - to visit/attend
-请问 (qǐng wèn) - may I ask
-你 (nǐ) - you
-叫 (jiào) - called
-什么 (shén me) - what
-名字 (míng zi) - name
-呢 (ne) - question particle
-
-Type your name using: 
-我叫 [your name] (wǒ jiào [your name])
-"""
     
-    # Generate audio for Chinese text only
-    audio_html = text_to_speech("欢迎光临！请问你叫什么名字呢？")
     message_id = len(st.session_state.chat_history)
     
     # Store the first message with all components
     st.session_state.chat_history.append({
         "role": "assistant",
-        "content": text_content,
+        "content": GREETING_MESSAGE,
         "id": message_id,
         "video_html": video_html  # Store video HTML separately
     })
-    st.session_state.audio_elements = {message_id: audio_html}
+    
+    # Audio is stored by key; the bytes live in the shared bundle/cache
+    st.session_state.audio_elements = {}
+    st.session_state.audio_errors = {}
+    st.session_state.pending_audio = {}
+    # Suggested-response audio keys and syntheses, keyed by (message id, suggestion number)
+    st.session_state.suggestion_audio = {}
+    st.session_state.pending_suggestion_audio = {}
+    
+    # Served from the pre-synthesized bundle; if it hasn't been built, synthesize off the first paint
+    greeting_key = stored_audio_key(BUNDLE_PHRASES["greeting"])
+    if greeting_key is not None:
+        set_audio_key(message_id, greeting_key)
+    else:
+        queue_speech(message_id, BUNDLE_PHRASES["greeting"])
+    save_session()
+
+# Free the messages of sessions that have gone quiet; they are paged back in from the store
+if get_session_store():
+    get_session_store().evict_idle(SESSION_IDLE_SECONDS)
+    # Also takes the lease on a conversation saved for the first time above
+    if time.time() >= st.session_state.lease_renew_at:
+        claim_session()
+
+startup_profile.mark("session_init")
+# False while the full script runs, True afterwards (fragment reruns see True)
+st.session_state.app_run_finished = False
 
 # Add these constants at the top of the file with other constants
 REACTION_VIDEOS = {
-    "appreciation": "https://i.imgur.com/kDA2aub.mp4",
-    "crying": "https://i.imgur.com/CjCaHt2.mp4",
-    "cheering": "https://i.imgur.com/cMD0EoE.mp4",
-    "sighing": "https://i.imgur.com/E0rQas1.mp4",
-    "thinking": "https://i.imgur.com/KPxXcZA.mp4"
+    name: get_video_sources()[name]["url"]
+    for name in ["appreciation", "crying", "cheering", "sighing", "thinking"]
 }
 
+# Fixed seed for the video cadence (e.g. for demos); otherwise each session draws its own
+REACTION_SEED = os.getenv("REACTION_SEED")
+if "reaction_seed" not in st.session_state:
+    st.session_state.reaction_seed = REACTION_SEED or random.randrange(2**32)
+
+@st.cache_resource(show_spinner=False)
+def get_reaction_classifier():
+    """Keyword automaton from src/config.json, compiled once per process"""
+    return ReactionClassifier.from_config()
+
 def should_show_video(message_count):
     """Determine if we should show a video based on message count"""
-    # Show video every 3-5 messages (randomly)
-    return message_count % random.randint(3, 5) == 0
+    # Show video every 3-5 messages, reproducible from the session's seed
+    return get_reaction_classifier().should_show(message_count, st.session_state.reaction_seed)
 
 def get_appropriate_video(message_content):
     """Select appropriate video based on message content"""
-    # Check message content for relevant keywords/sentiment
-    content_lower = message_content.lower()
-    
-    if any(word in content_lower for word in ["谢谢", "thank", "great", "good job", "well done", "很好"]):
-        return REACTION_VIDEOS["appreciation"]
-    elif any(word in content_lower for word in ["对不起", "sorry", "sad", "难过"]):
-        return REACTION_VIDEOS["crying"]
-    elif any(word in content_lower for word in ["太棒了", "wonderful", "amazing", "excellent", "开心"]):
-        return REACTION_VIDEOS["cheering"]
-    elif any(word in content_lower for word in ["哎呀", "唉", "difficult", "hard", "不好"]):
-        return REACTION_VIDEOS["sighing"]
-    elif any(word in content_lower for word in ["让我想想", "think", "考虑", "interesting", "hmm"]):
-        return REACTION_VIDEOS["thinking"]
-    
-    # Default to thinking video if no specific sentiment is matched
-    return REACTION_VIDEOS["thinking"]
+    category = get_reaction_classifier().classify(message_content)
+    return REACTION_VIDEOS.get(category, REACTION_VIDEOS["thinking"])
 
-def create_video_html(video_url):
-    """Create HTML for video display"""
-    return f"""
-        <div style="margin-bottom: 1rem;">
-            <video width="320" height="240" autoplay loop muted playsinline style="border-radius: 10px;">
-                <source src="{video_url}" type="video/mp4">
-            </video>
-        </div>
-    """
 
 # Process user response and update user_info
 def process_user_response(message):
-    if not st.session_state.user_info["name"]:
-        st.session_state.user_info["name"] = message
-        name_response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "assistant", "content": f"""
-你好，{message}！(nǐ hǎo, {message}!) ✨
-
-今天想喝点什么呢？(jīn tiān xiǎng hē diǎn shén me ne?)
-(What would you like to drink today?) ☕
-
-Try these phrases:
-我想要一杯... (wǒ xiǎng yào yī bēi...) - I would like a cup of...
-
----
-Word-by-Word Breakdown:
-你好 (nǐ hǎo) - hello
-今天 (jīn tiān) - today
-想 (xiǎng) - want to
-喝点 (hē diǎn) - drink something
-什么 (shén me) - what
-呢 (ne) - question particle
-我 (wǒ) - I
-想要 (xiǎng yào) - would like
-一 (yī) - one
-杯 (bēi) - cup (measure word)
-
-Common orders:
-1. 我想要一杯咖啡 
-   (wǒ xiǎng yào yī bēi kā fēi)
-   I would like a coffee
-
-2. 我想要一杯茶 
-   (wǒ xiǎng yào yī bēi chá)
-   I would like a tea
-
-3. 我想要一杯热巧克力
-   (wǒ xiǎng yào yī bēi rè qiǎo kè lì)
-   I would like a hot chocolate
-
-Type your order using one of these phrases!
-"""}
-            ]
-        )
-        name_message = name_response.choices[0].message.content
-        
-        # Generate audio for the greeting and question
-        audio_html = text_to_speech(
-            f"你好，{message}！今天想喝点什么呢？", 
-            user_name=message
-        )
-        message_id = len(st.session_state.chat_history)
+    """Advance onboarding; returns the scripted reply, or None if the LLM should answer"""
+    next_state, scripted_reply = handle_turn(
+        st.session_state.onboarding_state,
+        message,
+        st.session_state.user_info
+    )
+    st.session_state.onboarding_state = next_state
+    return scripted_reply
+
+def show_scripted_reply(reply):
+    """Answer a scripted onboarding turn from its template, with no API call"""
+    message_id = len(st.session_state.chat_history)
+    with st.chat_message("assistant", avatar=TUTOR_AVATAR):
+        st.markdown(reply)
         
-        st.session_state.chat_history.append({
-            "role": "assistant",
-            "content": name_message,
-            "id": message_id
-        })
-        st.session_state.audio_elements[message_id] = audio_html
-        return "continue_chat"
-    elif not st.session_state.user_info["proficiency"]:
-        st.session_state.user_info["proficiency"] = message.lower()
-        return "normal_chat"
-    return "normal_chat"
+        if st.session_state.onboarding_state == AWAITING_NAME:
+            # The answer had no name in it, so the name question is asked again
+            queue_speech(message_id, NAME_RETRY_SPEECH)
+        else:
+            # Greet by name; the drink question is pre-synthesized in the bundle
+            queue_speech(message_id, f"你好，{st.session_state.user_info['name']}！", BUNDLE_PHRASES["drink_prompt"])
+        display_audio(message_id)
+    
+    st.session_state.chat_history.append({
+        "role": "assistant",
+        "content": reply,
+        "id": message_id
+    })
+
+# Attach audio that finished synthesizing since the last run
+collect_finished_audio()
+
+# Only the most recent messages are redrawn on each rerun; older ones on request
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "20"))
+
+def history_window_start():
+    """Index of the first history message to draw on this rerun"""
+    hidden_count = len(st.session_state.chat_history) - HISTORY_WINDOW
+    if hidden_count <= 0:
+        return 0
+    # Fixed widget arguments: a label or help that changed with the count would give a new widget,
+    # resetting the toggle every time a message is added
+    if not st.toggle("Show earlier messages", key="show_earlier_messages"):
+        st.caption(f"{hidden_count} earlier message{'' if hidden_count == 1 else 's'} hidden")
+        return hidden_count
+    return 0
 
 # Display chat history
-for message in st.session_state.chat_history:
+render_started = time.perf_counter()
+for message in st.session_state.chat_history[history_window_start():]:
     avatar = TUTOR_AVATAR if message["role"] == "assistant" else USER_AVATAR
     with st.chat_message(message["role"], avatar=avatar):
-        # Display video only for the first message
+        # Display video only for the first message (inline HTML, no iframe per rerun)
         if message["role"] == "assistant" and "video_html" in message:
-            components.html(message["video_html"], height=300)
-        st.markdown(message["content"])
+            st.html(message["video_html"])
+        if message.get("structured"):
+            st.markdown(format_message(parse_structured(message["content"])))
+        else:
+            st.markdown(message["content"])
         # Display audio for assistant messages
-        if message["role"] == "assistant" and "id" in message and message["id"] in st.session_state.audio_elements:
-            st.markdown(st.session_state.audio_elements[message["id"]], unsafe_allow_html=True)
+        if message["role"] == "assistant" and "id" in message:
+            display_audio(message["id"])
+            if message.get("suggestion_audio"):
+                display_suggestion_audio(message)
+get_latency_metrics().observe("rerun.render_history", time.perf_counter() - render_started)
+startup_profile.mark("render_history")
+
+TYPING_INDICATOR_HTML = """
+                <div class="typing-indicator">
+                    <div class="typing-dot"></div>
+                    <div class="typing-dot"></div>
+                    <div class="typing-dot"></div>
+                </div>
+            """
 
 # Add function to show typing indicator
 def show_typing_indicator():
@@ -904,102 +764,242 @@ def show_typing_indicator():
     placeholder = st.empty()
     with placeholder.container():
         with st.chat_message("assistant", avatar=TUTOR_AVATAR):
-            st.markdown("""
-                <div class="typing-indicator">
-                    <div class="typing-dot"></div>
-                    <div class="typing-dot"></div>
-                    <div class="typing-dot"></div>
-                </div>
-            """, unsafe_allow_html=True)
+            st.markdown(TYPING_INDICATOR_HTML, unsafe_allow_html=True)
     return placeholder
 
-# Add this function before the chat handling code
-def format_message_content(content):
+def show_queue_position(placeholder, position):
+    """Typing dots plus the turn's place in line while the café is busy"""
+    with placeholder.container():
+        st.markdown(TYPING_INDICATOR_HTML, unsafe_allow_html=True)
+        st.caption(f"☕ 茜茜 is serving other customers — you're #{position} in line")
+
+# Shown when the request queue is full or a turn waited too long for its slot
+BUSY_MESSAGE = "☕ The café is very busy right now. Please send your message again in a moment."
+
+def format_message_content(content, structured=False):
     """Format the message content with proper spacing"""
-    lines = content.split('\n')
+    return format_message(parse_reply(content, structured))
+
+# Prompt size limits: recent turns stay verbatim, older ones are summarized
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "6"))
+CONTEXT_FOLD_BATCH = int(os.getenv("CONTEXT_FOLD_BATCH", "4"))
+SUMMARY_MAX_TOKENS = 200
+
+def build_user_context():
+    """Per-user context, sent after the static tutor prompt"""
+    context_lines = []
+    if st.session_state.user_info["name"]:
+        context_lines.append(f"User's name: {st.session_state.user_info['name']}")
+    if st.session_state.user_info["proficiency"]:
+        context_lines.append(f"Proficiency level: {st.session_state.user_info['proficiency']}")
+    if st.session_state.context_summary:
+        context_lines.append(f"Summary of the earlier conversation:\n{st.session_state.context_summary}")
+    return "\n".join(context_lines)
+
+def build_chat_messages():
+    """Assemble the prompt within PROMPT_TOKEN_BUDGET, folding older turns into the summary.
+
+    SYSTEM_PROMPT always comes first and byte-identical for every user, so the
+    provider's automatic prompt caching can reuse it; everything per-user follows it.
+    Call it while holding the turn's chat slot: the summary request uses that slot.
+    """
+    history = st.session_state.chat_history
+    structured_tokens = count_tokens(STRUCTURED_INSTRUCTIONS) if STRUCTURED_REPLIES else 0
+    summary_reserve = SUMMARY_MAX_TOKENS if history else 0
+    start = plan_context(
+        history,
+        st.session_state.summarized_upto,
+        fixed_tokens=count_tokens(SYSTEM_PROMPT) + structured_tokens + count_tokens(build_user_context()) + summary_reserve,
+        budget=PROMPT_TOKEN_BUDGET,
+        recent_messages=CONTEXT_RECENT_TURNS * 2,
+        fold_batch=CONTEXT_FOLD_BATCH
+    )
+    
+    if start > st.session_state.summarized_upto:
+        try:
+            st.session_state.context_summary, summary_usage = get_chat_policy().call(lambda timeout: update_summary(
+                get_openai_client(api_key).with_options(timeout=timeout),
+                CHAT_MODEL,
+                st.session_state.context_summary,
+                history[st.session_state.summarized_upto:start],
+                max_tokens=SUMMARY_MAX_TOKENS
+            ))
+            st.session_state.summarized_upto = start
+            get_usage_tracker().record(
+                "summary", CHAT_MODEL, summary_usage,
+                session=st.session_state.usage_totals, session_id=st.session_state.session_id
+            )
+        except Exception:
+            # Keep the old summary and send the unfolded turns verbatim; folding is retried next turn
+            start = st.session_state.summarized_upto
+    
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if STRUCTURED_REPLIES:
+        messages.append({"role": "system", "content": STRUCTURED_INSTRUCTIONS})
+    user_context = build_user_context()
+    if user_context:
+        messages.append({"role": "system", "content": user_context})
+    messages.extend({"role": m["role"], "content": m["content"]} for m in history[start:])
+    return messages
+
+# Stream completions into the chat bubble token by token (set STREAM_COMPLETIONS=0 to disable)
+STREAM_COMPLETIONS = os.getenv("STREAM_COMPLETIONS", "1") != "0"
+
+# Ask for JSON replies matching REPLY_SCHEMA instead of formatted text (not streamed).
+# Schema-constrained output needs a model that supports structured outputs.
+STRUCTURED_REPLIES = os.getenv("STRUCTURED_REPLIES", "0") == "1"
+STRUCTURED_REPLY_MODEL = os.getenv("STRUCTURED_REPLY_MODEL", "gpt-4o-mini")
+
+def request_structured_reply(messages):
+    """Non-streamed completion constrained to REPLY_SCHEMA"""
+    return get_chat_policy().call(lambda timeout: get_openai_client(api_key).chat.completions.create(
+        model=STRUCTURED_REPLY_MODEL,
+        messages=messages,
+        response_format={
+            "type": "json_schema",
+            "json_schema": {"name": "tutor_reply", "strict": True, "schema": REPLY_SCHEMA}
+        },
+        timeout=timeout
+    ))
+
+def draw_stream(deltas, placeholder, turn, started):
+    """Draw streamed reply text into placeholder, formatting each line once it is complete"""
+    response_text = ""
     formatted_lines = []
+    pending_line = ""
+    for delta in deltas:
+        if not response_text:
+            turn.add("first_token", time.perf_counter() - started)
+        response_text += delta
+        
+        # Format completed lines once; the unfinished tail is shown raw until its newline arrives
+        with turn.span("format"):
+            *completed_lines, pending_line = (pending_line + delta).split('\n')
+            for line in completed_lines:
+                formatted_lines.extend(format_line(classify_line(line), line))
+        placeholder.markdown('\n'.join(formatted_lines + [pending_line]))
     
-    for line in lines:
-        # Skip the "Repeat after me" header and dividers
-        if any(skip in line for skip in ['🎯 Repeat after me:', '-------------------']):
-            continue
-            
-        # Handle Chinese text and translations
-        elif '(' in line and ')' in line and any('\u4e00' <= c <= '\u9fff' for c in line):
-            # Split multiple sentences if they exist
-            sentences = line.split('。')
-            for sentence in sentences:
-                if sentence.strip():
-                    formatted_lines.append(sentence.strip() + '。')
-                    formatted_lines.append('')  # Add empty line after each sentence
-            
-        # Handle section headers
-        elif line.startswith('Word-by-Word Breakdown:'):
-            formatted_lines.extend(['', line, ''])
-            
-        # Handle suggested responses section
-        elif line.startswith('Suggested Responses:') or line.startswith('👉 Try'):
-            formatted_lines.extend([
-                '',
-                '---',
-                '👉 Try one of these responses:',
-                ''
-            ])
-            
-        # Handle numbered responses
-        elif line.strip().startswith(('1.', '2.', '3.')):
-            parts = line.split(')')
-            if len(parts) > 1:
-                formatted_lines.extend([
-                    '',
-                    f'🗣 {parts[0]})',  # Chinese
-                    f'   {parts[1].strip()}' if len(parts) > 1 else '',  # Pinyin
-                ])
-            else:
-                formatted_lines.extend(['', f'🗣 {line}'])
-            
-        # Handle word explanations
-        elif 'Word Explanation:' in line:
-            formatted_lines.extend(['', '   ' + line])
-            
-        # Handle scenario descriptions
-        elif line.startswith('*') and line.endswith('*'):
-            formatted_lines.extend(['', line, ''])
-            
-        # Handle other lines that aren't empty
-        elif line.strip():
-            formatted_lines.append(line)
+    with turn.span("format"):
+        formatted = format_message_content(response_text)
+    placeholder.markdown(formatted)
+    return response_text
+
+def stream_assistant_response(messages, placeholder, turn):
+    """Stream the reply into placeholder on the script thread"""
+    started = time.perf_counter()
+    # Opening the stream is retried; a stall once tokens flow fails the turn after CHAT_TIMEOUT
+    stream = get_chat_policy().call(lambda timeout: get_openai_client(api_key).chat.completions.create(
+        model=CHAT_MODEL,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        timeout=timeout
+    ))
     
-    return '\n'.join(formatted_lines)
-
-# Update the chat input handling section
-if prompt := st.chat_input("Type your message here...", key="main_chat_input"):
-    # Add user message to chat
-    with st.chat_message("user", avatar=USER_AVATAR):
-        st.markdown(prompt)
-    st.session_state.chat_history.append({"role": "user", "content": prompt})
+    usage = None
+    def deltas():
+        nonlocal usage
+        for chunk in stream:
+            # The final chunk carries usage and no choices
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
-    # Show typing indicator while processing
-    typing_placeholder = show_typing_indicator()
+    response_text = draw_stream(deltas(), placeholder, turn, started)
+    return response_text, usage
+
+# Run streamed turns on one event loop per process (set ASYNC_TURNS=0 to stream on the script thread)
+ASYNC_TURNS = os.getenv("ASYNC_TURNS", "1") != "0"
+
+def create_async_openai_client():
+    """AsyncOpenAI client for the turn engine's event loop"""
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=api_key, max_retries=0)
+
+@st.cache_resource(show_spinner=False)
+def get_turn_engine():
+    """Create the event loop and async client once per process, shared by all sessions"""
+    return TurnEngine(create_async_openai_client, policy=get_chat_policy())
+
+def stream_reply_async(messages, placeholder, turn, message_id, include_video):
+    """Stream the reply on the turn engine while its speech and reaction video are prepared.
+
+    Speech for the tutor's sentences is queued as soon as they are complete,
+    while the suggestions and breakdown are still streaming. Once the reply
+    is done, the video is chosen and any speech not yet queued is started
+    concurrently. Returns (text, usage, extras) with extras["video_html"]
+    and extras["speech"] (the queued Chinese text, or "").
+    """
+    started = time.perf_counter()
+    # Read from the script thread; the hooks below run on the engine's loop and worker threads
+    tts_gate = get_tts_gate()
+    session_id = st.session_state.session_id
+    usage_totals = st.session_state.usage_totals
+    user_name = st.session_state.user_info["name"]
+    speech = {}
     
-    # Process response based on conversation state
-    chat_state = process_user_response(prompt)
+    def start_speech(text):
+        if speech.get("cancelled"):
+            return
+        speech["text"] = speech_text(parse_lines(text), user_name)
+        speech["started"] = time.perf_counter() - started
+        if speech["text"]:
+            try:
+                speech["future"] = tts_gate.submit(session_id, synthesize_audio, speech["text"], session_usage=usage_totals)
+            except GateFull as e:
+                speech["error"] = str(e)
     
-    # Prepare system message with user context
-    system_message = SYSTEM_PROMPT
-    if st.session_state.user_info["name"]:
-        system_message += f"\nUser's name: {st.session_state.user_info['name']}"
-    if st.session_state.user_info["proficiency"]:
-        system_message += f"\nProficiency level: {st.session_state.user_info['proficiency']}"
+    def on_line(line, text):
+        if "text" not in speech and ends_reply(line):
+            start_speech(text)
+    
+    def reply_speech(text):
+        # Replies without suggestions or a breakdown are only complete now
+        if "text" not in speech:
+            start_speech(text)
+        return speech["text"]
     
-    # Get assistant response
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": system_message},
-            *[{"role": m["role"], "content": m["content"]} for m in st.session_state.chat_history]
-        ]
+    def reply_video(text):
+        return create_video_html(get_appropriate_video(text)) if include_video else None
+    
+    streaming = get_turn_engine().start(
+        {"model": CHAT_MODEL, "messages": messages, "stream_options": {"include_usage": True}},
+        on_line=on_line,
+        after_reply={"speech": reply_speech, "video_html": reply_video}
     )
+    try:
+        draw_stream(streaming.deltas(), placeholder, turn, started)
+        with turn.span("after_reply"):
+            response_text, usage, extras = streaming.result()
+    except BaseException:
+        # A rerun, a closed tab or a failed stream: stop the turn and its speech before the chat slot is freed
+        speech["cancelled"] = True
+        streaming.cancel(timeout=CHAT_TIMEOUT)
+        if "future" in speech:
+            speech["future"].cancel()
+        raise
+    
+    turn.add("speech_start", speech["started"])
+    if "future" in speech:
+        st.session_state.pending_audio[message_id] = speech["future"]
+    elif "error" in speech:
+        st.session_state.audio_errors[message_id] = speech["error"]
+    return response_text, usage, extras
+
+def run_llm_turn(typing_placeholder, turn):
+    """Answer a free-form turn with the LLM, timing each stage in turn"""
+    # Test the connection before the first API call (kept off the first paint)
+    try:
+        with turn.span("health_check"):
+            check_api_health(api_key)
+    except Exception as e:
+        typing_placeholder.empty()
+        st.error(f"❌ API Error: {str(e)}")
+        # The run ends here, so let the audio polling fragments stop as they would at the end of the script
+        st.session_state.app_run_finished = True
+        st.stop()
     
     # Remove typing indicator before showing response
     typing_placeholder.empty()
@@ -1007,45 +1007,189 @@ if prompt := st.chat_input("Type your message here...", key="main_chat_input"):
     # Generate a unique ID for this message
     message_id = len(st.session_state.chat_history)
     
-    # Get assistant response content
-    assistant_response = response.choices[0].message.content
-    
     # Determine if we should show a video
     should_include_video = should_show_video(message_id)
     
-    # Create message data
-    message_data = {
-        "role": "assistant",
-        "content": assistant_response,
-        "id": message_id
-    }
-    
-    # Add video if appropriate
-    if should_include_video:
-        video_url = get_appropriate_video(assistant_response)
-        message_data["video_html"] = create_video_html(video_url)
-    
     # Display message with video if present
     with st.chat_message("assistant", avatar=TUTOR_AVATAR):
+        video_placeholder = st.empty()
+        
+        # Keep the typing dots inside the bubble until the reply arrives
+        content_placeholder = st.empty()
+        content_placeholder.markdown(TYPING_INDICATOR_HTML, unsafe_allow_html=True)
+        
+        # Speech and video already prepared by the turn engine (async streamed turns only)
+        reply_extras = None
+        
+        # Get assistant response once a chat slot is free, showing the place in line meanwhile
+        try:
+            with chat_slot(lambda position: show_queue_position(content_placeholder, position)) as waited:
+                turn.add("queue_wait", waited)
+                # Static tutor prompt first, then user context and recent history.
+                # A summary update runs in this slot too, so the turn waits in line only once.
+                with turn.span("build_prompt"):
+                    messages = build_chat_messages()
+                with turn.span("completion"):
+                    if STRUCTURED_REPLIES:
+                        response = request_structured_reply(messages)
+                    elif STREAM_COMPLETIONS and ASYNC_TURNS:
+                        assistant_response, usage, reply_extras = stream_reply_async(
+                            messages, content_placeholder, turn, message_id, should_include_video
+                        )
+                    elif STREAM_COMPLETIONS:
+                        assistant_response, usage = stream_assistant_response(messages, content_placeholder, turn)
+                    else:
+                        response = get_chat_policy().call(lambda timeout: get_openai_client(api_key).chat.completions.create(
+                            model=CHAT_MODEL,
+                            messages=messages,
+                            timeout=timeout
+                        ))
+        except GateFull:
+            content_placeholder.warning(BUSY_MESSAGE)
+            return
+        except Exception as e:
+            # Retries and the deadline are spent; the user can send the message again
+            content_placeholder.error(f"❌ API Error: {str(e)}")
+            return
+        if STRUCTURED_REPLIES or not STREAM_COMPLETIONS:
+            assistant_response = response.choices[0].message.content
+            usage = response.usage
+            
+            # Format the content before displaying
+            with turn.span("format"):
+                formatted = format_message_content(assistant_response, structured=STRUCTURED_REPLIES)
+            content_placeholder.markdown(formatted)
+        
+        # Create message data
+        message_data = {
+            "role": "assistant",
+            "content": assistant_response,
+            "id": message_id,
+            "usage": get_usage_tracker().record(
+                "chat_turn",
+                STRUCTURED_REPLY_MODEL if STRUCTURED_REPLIES else CHAT_MODEL,
+                usage,
+                session=st.session_state.usage_totals,
+                session_id=st.session_state.session_id,
+                history_messages=len(messages),
+                system_prompt_tokens=count_tokens(SYSTEM_PROMPT)
+            )
+        }
+        if STRUCTURED_REPLIES:
+            message_data["structured"] = True
+        
+        # Add video if appropriate
         if should_include_video:
-            components.html(message_data["video_html"], height=300)
+            with turn.span("video_selection"):
+                if reply_extras is not None:
+                    message_data["video_html"] = reply_extras["video_html"]
+                else:
+                    message_data["video_html"] = create_video_html(get_appropriate_video(assistant_response))
+            with video_placeholder.container():
+                st.html(message_data["video_html"])
         
-        # Format the content before displaying
-        formatted_content = format_message_content(assistant_response)
-        st.markdown(formatted_content)
+        # Synthesize the Chinese sentences in the background; the player appears when ready
+        with turn.span("tts_queue"):
+            if reply_extras is not None:
+                chinese_text = reply_extras["speech"]
+            else:
+                chinese_text = extract_chinese_text(
+                    assistant_response, 
+                    user_name=st.session_state.user_info["name"],
+                    structured=STRUCTURED_REPLIES
+                )
+                if chinese_text:
+                    queue_speech(message_id, chinese_text)
+        if chinese_text:
+            display_audio(message_id)
         
-        # Generate and display audio for the first Chinese sentence only
-        audio_html = text_to_speech(
-            assistant_response, 
-            user_name=st.session_state.user_info["name"]
-        )
-        if audio_html:
-            st.session_state.audio_elements[message_id] = audio_html
-            st.markdown(audio_html, unsafe_allow_html=True)
+        # The suggested responses are synthesized next, queued behind the tutor's line
+        if SUGGESTION_AUDIO:
+            with turn.span("suggestion_queue"):
+                suggestions = suggestion_texts(message_data)
+                if suggestions:
+                    queue_suggestion_speech(message_id, suggestions)
+                    message_data["suggestion_audio"] = True
+            if suggestions:
+                display_suggestion_audio(message_data)
     
     # Add response to chat history
     st.session_state.chat_history.append(message_data)
 
+# Update the chat input handling section
+if prompt := st.chat_input("Type your message here...", key="main_chat_input"):
+    # Add user message to chat
+    with st.chat_message("user", avatar=USER_AVATAR):
+        st.markdown(prompt)
+    st.session_state.chat_history.append({"role": "user", "content": prompt})
+    
+    # Show typing indicator while processing
+    typing_placeholder = show_typing_indicator()
+    
+    # Scripted onboarding turns are answered locally; everything else goes to the LLM
+    turn = get_latency_metrics().turn()
+    with turn.span("process_user_response"):
+        scripted_reply = process_user_response(prompt)
+    if scripted_reply:
+        turn.kind = "scripted"
+        typing_placeholder.empty()
+        with turn.span("render"):
+            show_scripted_reply(scripted_reply)
+    else:
+        turn.kind = "llm"
+        run_llm_turn(typing_placeholder, turn)
+    save_session()
+    turn.finish(message_id=len(st.session_state.chat_history) - 1)
+
+# Usage, cost and stage latency for operators (SHOW_USAGE_SIDEBAR=1)
+SHOW_USAGE_SIDEBAR = os.getenv("SHOW_USAGE_SIDEBAR", "0") == "1"
+
+def show_usage_totals(label, totals):
+    """One block of usage counters in the sidebar"""
+    st.caption(label)
+    tokens_col, cost_col = st.columns(2)
+    tokens_col.metric("Prompt tokens", f"{totals['prompt_tokens']:,}")
+    cost_col.metric("Cost (USD)", f"{totals['cost']:.4f}")
+    tokens_col.metric("Completion tokens", f"{totals['completion_tokens']:,}")
+    cost_col.metric("TTS characters", f"{totals['characters']:,}")
+    st.caption(f"{totals['requests']} API calls, {totals['cache_hit_rate']:.0%} of prompt tokens cached")
+
+def show_usage_sidebar():
+    """Session and process usage plus per-stage latency, in the sidebar"""
+    with st.sidebar:
+        st.subheader("Usage")
+        show_usage_totals("This session", st.session_state.usage_totals.totals())
+        show_usage_totals("All sessions in this process", get_usage_tracker().stats())
+        st.table([
+            dict(purpose=purpose, **{name: round(value, 4) for name, value in totals.items()})
+            for purpose, totals in get_usage_tracker().process.by_purpose().items()
+        ])
+        
+        st.subheader("Request queues")
+        st.table([
+            dict(gate=gate.name, **{name: round(value, 4) for name, value in gate.stats().items()})
+            for gate in (get_chat_gate(), get_tts_gate())
+        ])
+        
+        st.subheader("API calls")
+        st.table([
+            dict(call=policy.name, **policy.stats())
+            for policy in (get_chat_policy(), get_tts_policy())
+        ])
+
+        st.subheader("Speech")
+        st.table([{name: round(value, 4) for name, value in get_audio_cache().stats().items()}])
+        st.table([get_speech_backend(api_key).stats()])
+
+        st.subheader("Latency (ms)")
+        st.table([
+            {"stage": stage, "n": row["count"], "p50": round(row["p50"] * 1000), "p95": round(row["p95"] * 1000), "p99": round(row["p99"] * 1000)}
+            for stage, row in get_latency_metrics().stats().items()
+        ])
+
+if SHOW_USAGE_SIDEBAR:
+    show_usage_sidebar()
+
 # Add this JavaScript to automatically scroll to the latest message
 st.markdown("""
 <script>
@@ -1063,3 +1207,6 @@ observer.observe(
 );
 </script>
 """, unsafe_allow_html=True)
+startup_profile.mark("chat_input")
+st.session_state.app_run_finished = True
+startup_profile.finish()
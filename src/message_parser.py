@@ -0,0 +1,266 @@
+"""Single-pass parser for tutor messages.
+
+A reply is scanned once into a ParsedMessage (scene line, Chinese sentences,
+pinyin, translation, suggested responses and word explanations) that both
+speech extraction and display formatting read from. Structured (JSON)
+replies are mapped onto the same ParsedMessage without any text scanning.
+"""
+import re
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+CJK_PATTERN = re.compile(r'[一-鿿]')
+TONE_MARK_PATTERN = re.compile(r'[āáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜ]')
+LATIN_WORD_PATTERN = re.compile(r'[^\W\d_一-鿿]+')
+SCENE_PATTERN = re.compile(r'^\*[^*]+\*')
+NUMBERED_PATTERN = re.compile(r'^(?:🗣\s*)?(\d+)\.\s*(.*)$')
+# "欢迎 (huān yíng) - welcome" or "拿铁 - latte"
+WORD_PATTERN = re.compile(r'^(.+?)\s*(?:\((.*?)\))?\s+-\s+(.+)$')
+
+# Line kinds, in the order display formatting checks them
+SKIP = "skip"
+CHINESE = "chinese"
+BREAKDOWN_HEADER = "breakdown_header"
+SUGGESTIONS_HEADER = "suggestions_header"
+NUMBERED = "numbered"
+EXPLANATION_HEADER = "explanation_header"
+SCENE = "scene"
+TEXT = "text"
+BLANK = "blank"
+
+DISPLAY_SKIP_MARKERS = ('🎯 Repeat after me:', '-------------------')
+
+# Sections of a reply: the tutor's own line, the suggestions, the vocabulary breakdown
+REPLY = "reply"
+SUGGESTIONS = "suggestions"
+BREAKDOWN = "breakdown"
+
+
+@dataclass
+class Suggestion:
+    chinese: str
+    pinyin: str = ""
+    english: str = ""
+    words: list = field(default_factory=list)
+
+
+@dataclass
+class ParsedMessage:
+    scene: str = ""
+    chinese: list = field(default_factory=list)
+    pinyin: list = field(default_factory=list)
+    translation: list = field(default_factory=list)
+    suggestions: list = field(default_factory=list)
+    # (word, pinyin, meaning) from breakdowns and word explanations
+    words: list = field(default_factory=list)
+    # (kind, line) for every input line, used for display formatting; empty for structured replies
+    lines: list = field(default_factory=list)
+
+
+def classify_line(line):
+    """Classify one line for display formatting"""
+    stripped = line.strip()
+    if any(marker in line for marker in DISPLAY_SKIP_MARKERS):
+        return SKIP
+    if '(' in line and ')' in line and CJK_PATTERN.search(line):
+        return CHINESE
+    if line.startswith('Word-by-Word Breakdown:'):
+        return BREAKDOWN_HEADER
+    if line.startswith('Suggested Responses:') or line.startswith('👉 Try'):
+        return SUGGESTIONS_HEADER
+    if stripped.startswith(('1.', '2.', '3.')):
+        return NUMBERED
+    if 'Word Explanation:' in line:
+        return EXPLANATION_HEADER
+    if line.startswith('*') and line.endswith('*'):
+        return SCENE
+    if stripped:
+        return TEXT
+    return BLANK
+
+
+def is_pinyin(text):
+    """Tone marks and only syllable-sized words (so "café" in an English line doesn't count)"""
+    return (
+        TONE_MARK_PATTERN.search(text) is not None
+        and all(len(word) <= 6 for word in LATIN_WORD_PATTERN.findall(text))
+    )
+
+
+def split_translation(text):
+    """Split "中文 (pīn yīn)" into its Chinese part and the parenthesized remainder"""
+    chinese_part, _, rest = text.partition('(')
+    return chinese_part.strip(), rest.rsplit(')', 1)[0].strip()
+
+
+def parse_lines(text):
+    """Parse a reply in one pass (uncached; see parse_message)"""
+    parsed = ParsedMessage()
+    section = REPLY
+    suggestion = None
+
+    for line in text.split('\n'):
+        kind = classify_line(line)
+        parsed.lines.append((kind, line))
+        stripped = line.strip()
+        if kind in (BLANK, SKIP):
+            continue
+
+        # Section changes
+        if kind == SUGGESTIONS_HEADER or stripped.startswith(('Try ', 'Common orders')):
+            section = SUGGESTIONS
+            continue
+        if kind == BREAKDOWN_HEADER or stripped == '---':
+            section = BREAKDOWN
+            suggestion = None
+            continue
+        if kind == EXPLANATION_HEADER:
+            continue
+
+        has_cjk = CJK_PATTERN.search(stripped) is not None
+        numbered = NUMBERED_PATTERN.match(stripped) if stripped[:1].isdigit() or stripped.startswith('🗣') else None
+        word = WORD_PATTERN.match(stripped) if has_cjk and ' - ' in stripped else None
+
+        if numbered and has_cjk:
+            chinese_part, pinyin = split_translation(numbered.group(2))
+            suggestion = Suggestion(chinese=chinese_part, pinyin=pinyin)
+            parsed.suggestions.append(suggestion)
+        elif word and CJK_PATTERN.search(word.group(1)):
+            entry = (word.group(1).strip(), (word.group(2) or "").strip(), word.group(3).strip())
+            parsed.words.append(entry)
+            if suggestion is not None:
+                suggestion.words.append(entry)
+        elif section == REPLY and SCENE_PATTERN.match(stripped) and has_cjk:
+            parsed.scene = stripped
+        elif stripped.startswith('('):
+            inner = stripped[1:].rsplit(')', 1)[0].strip()
+            if has_cjk:
+                continue
+            inner_is_pinyin = is_pinyin(inner)
+            if suggestion is not None:
+                if inner_is_pinyin and not suggestion.pinyin:
+                    suggestion.pinyin = inner
+                elif not suggestion.english:
+                    suggestion.english = inner
+            elif section == REPLY:
+                (parsed.pinyin if inner_is_pinyin else parsed.translation).append(inner)
+        elif has_cjk and section == REPLY:
+            chinese_part, pinyin = split_translation(stripped)
+            parsed.chinese.append(chinese_part)
+            if pinyin:
+                parsed.pinyin.append(pinyin)
+        elif suggestion is not None and not suggestion.english:
+            suggestion.english = stripped
+        elif section == REPLY and not SCENE_PATTERN.match(stripped):
+            parsed.translation.append(stripped)
+
+    return parsed
+
+
+def ends_reply(line):
+    """Whether a line starts the part after the tutor's own sentences (suggestions or breakdown)"""
+    stripped = line.strip()
+    if classify_line(line) in (SUGGESTIONS_HEADER, BREAKDOWN_HEADER):
+        return True
+    if stripped == '---' or stripped.startswith(('Try ', 'Common orders')):
+        return True
+    numbered = NUMBERED_PATTERN.match(stripped) if stripped[:1].isdigit() or stripped.startswith('🗣') else None
+    return numbered is not None and CJK_PATTERN.search(stripped) is not None
+
+
+@lru_cache(maxsize=1024)
+def parse_message(text):
+    """Parse a reply once; repeated calls for the same message are served from cache"""
+    return parse_lines(text)
+
+
+@lru_cache(maxsize=1024)
+def parse_structured(text):
+    """Map a JSON reply (see prompts.REPLY_SCHEMA) onto a ParsedMessage; non-JSON falls back to parse_message"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return parse_message(text)
+
+    parsed = ParsedMessage(scene=data.get("scene", "").strip())
+    for name, values in (("chinese", parsed.chinese), ("pinyin", parsed.pinyin), ("english", parsed.translation)):
+        if data.get(name, "").strip():
+            values.append(data[name].strip())
+    for item in data.get("suggestions", []):
+        parsed.suggestions.append(Suggestion(
+            chinese=item.get("chinese", ""), pinyin=item.get("pinyin", ""), english=item.get("english", "")
+        ))
+    for item in data.get("vocab", []):
+        parsed.words.append((item.get("word", ""), item.get("pinyin", ""), item.get("meaning", "")))
+    return parsed
+
+
+def format_fields(parsed):
+    """Display lines for a structured reply, laid out like the formatted text replies"""
+    formatted_lines = []
+    if parsed.scene:
+        scene = parsed.scene if parsed.scene.startswith('*') else f'*{parsed.scene}*'
+        formatted_lines.extend(['', scene, ''])
+    for chinese in parsed.chinese:
+        formatted_lines.extend([chinese, ''])
+    formatted_lines.extend(f'({text})' for text in parsed.pinyin + parsed.translation)
+
+    if parsed.suggestions:
+        formatted_lines.extend(['', '---', '👉 Try one of these responses:', ''])
+        for number, suggestion in enumerate(parsed.suggestions, 1):
+            pinyin = f' ({suggestion.pinyin})' if suggestion.pinyin else ''
+            formatted_lines.extend(['', f'🗣 {number}. {suggestion.chinese}{pinyin}', f'   {suggestion.english}'])
+
+    if parsed.words:
+        formatted_lines.extend(['', 'Word-by-Word Breakdown:', ''])
+        for word, pinyin, meaning in parsed.words:
+            formatted_lines.append(f'{word} ({pinyin}) - {meaning}' if pinyin else f'{word} - {meaning}')
+    return formatted_lines
+
+
+def format_line(kind, line):
+    """Display lines for one classified input line"""
+    if kind == CHINESE:
+        # Split multiple sentences if they exist, with an empty line after each
+        formatted = []
+        for sentence in line.split('。'):
+            if sentence.strip():
+                formatted.extend([sentence.strip() + '。', ''])
+        return formatted
+    if kind in (BREAKDOWN_HEADER, SCENE):
+        return ['', line, '']
+    if kind == SUGGESTIONS_HEADER:
+        return ['', '---', '👉 Try one of these responses:', '']
+    if kind == NUMBERED:
+        parts = line.split(')')
+        if len(parts) > 1:
+            return ['', f'🗣 {parts[0]})', f'   {parts[1].strip()}']
+        return ['', f'🗣 {line}']
+    if kind == EXPLANATION_HEADER:
+        return ['', '   ' + line]
+    if kind == TEXT:
+        return [line]
+    return []
+
+
+def format_message(parsed):
+    """Format a parsed message for display with proper spacing"""
+    if not parsed.lines:
+        return '\n'.join(format_fields(parsed))
+    formatted_lines = []
+    for kind, line in parsed.lines:
+        formatted_lines.extend(format_line(kind, line))
+    return '\n'.join(formatted_lines)
+
+
+def speech_text(parsed, user_name=None):
+    """The tutor's Chinese sentences, joined for text-to-speech"""
+    chinese_text = ' '.join(parsed.chinese)
+
+    # Replace [name] with actual name if present
+    if user_name and chinese_text:
+        chinese_text = chinese_text.replace("[name]", user_name)
+    return chinese_text
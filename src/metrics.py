@@ -0,0 +1,214 @@
+"""Per-stage latency spans for chat turns, aggregated per process.
+
+Each stage gets a histogram with fixed buckets. The histograms can be
+rendered in the Prometheus text format (render_prometheus) or summarized
+with p50/p95/p99 estimates (stats). Event counters (retries, hedges, ...)
+are exported alongside them. Finished turns can also be appended to
+a JSONL log, one line per turn with the duration of each of its stages.
+Exact percentiles per stage from such a log:
+
+    python src/metrics.py turns.jsonl
+"""
+import os
+import sys
+import json
+import time
+import logging
+import statistics
+import tempfile
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, roughly from parsing (ms) up to slow completions
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+METRIC_NAME = "chat_stage_duration_seconds"
+COUNTER_NAME = "api_call_events_total"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects it"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for index, upper in enumerate(self.buckets):
+            if seconds <= upper:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating linearly inside its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return lower
+
+
+class Turn:
+    """Spans of one chat turn; recorded into the process metrics by finish()"""
+
+    def __init__(self, metrics, kind="turn"):
+        self.metrics = metrics
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def finish(self, **labels):
+        self.add("total", time.perf_counter() - self.started)
+        self.metrics.record_turn(self, labels)
+
+
+class LatencyMetrics:
+    """Histograms per stage for every session in the process, with optional file exports.
+
+    prometheus_path is rewritten atomically after each turn (for a node_exporter
+    textfile collector or any scraper that reads files); jsonl_path gets one
+    line per finished turn.
+    """
+
+    def __init__(self, prometheus_path=None, jsonl_path=None):
+        self.prometheus_path = prometheus_path
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def turn(self, kind="turn"):
+        return Turn(self, kind)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, event, value=1):
+        """Increment an event counter (e.g. "chat.retries")"""
+        with self._lock:
+            self._counters[event] = self._counters.get(event, 0) + value
+
+    def counters(self):
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    @contextmanager
+    def span(self, stage):
+        """Time a stage outside of a turn (background work, reruns)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def record_turn(self, turn, labels):
+        for stage, seconds in turn.stages.items():
+            self.observe(f"{turn.kind}.{stage}", seconds)
+        if self.jsonl_path:
+            entry = dict(labels, ts=time.time(), kind=turn.kind, stages={
+                stage: round(seconds, 6) for stage, seconds in turn.stages.items()
+            })
+            try:
+                with open(self.jsonl_path, "a", encoding="utf-8") as log_file:
+                    log_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning("could not append turn metrics to %s: %s", self.jsonl_path, e)
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+
+    def render_prometheus(self):
+        """All histograms in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of chat pipeline stages.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for upper, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if upper == float("inf") else repr(upper)
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+            if self._counters:
+                lines.append(f"# HELP {COUNTER_NAME} API call attempts, retries, failures and hedges.")
+                lines.append(f"# TYPE {COUNTER_NAME} counter")
+                for event, value in sorted(self._counters.items()):
+                    lines.append(f'{COUNTER_NAME}{{event="{event}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as prom_file:
+                prom_file.write(self.render_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("could not write metrics to %s: %s", path, e)
+
+    def stats(self):
+        """{stage: {"count", "mean", "p50", "p95", "p99"}} in seconds"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                }
+                for stage, histogram in sorted(self._histograms.items())
+            }
+
+
+def summarize_jsonl(path):
+    """{kind.stage: {"count", "p50", "p95", "p99"}} from a turn log"""
+    durations = {}
+    with open(path, encoding="utf-8") as log_file:
+        for line in log_file:
+            entry = json.loads(line)
+            for stage, seconds in entry["stages"].items():
+                durations.setdefault(f"{entry['kind']}.{stage}", []).append(seconds)
+
+    summary = {}
+    for stage, values in sorted(durations.items()):
+        # quantiles() needs two points; a single turn is its own percentile
+        cuts = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+        summary[stage] = {"count": len(values), "p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+    return summary
+
+
+if __name__ == "__main__":
+    for stage, row in summarize_jsonl(sys.argv[1]).items():
+        print(f"{stage:40} n={row['count']:<6} p50={row['p50'] * 1000:9.1f}ms "
+              f"p95={row['p95'] * 1000:9.1f}ms p99={row['p99'] * 1000:9.1f}ms")
@@ -0,0 +1,160 @@
+"""Scripted onboarding turns.
+
+The first turns of every session follow a fixed script (greeting, name
+capture, first drink prompt). They are answered from the templates below with
+the learner's name substituted; only free-form turns go to the LLM. The
+learner's level is taken from whichever message first states one, so an
+answer to the name question like "I'm a beginner" keeps the level and asks
+for the name again.
+"""
+import re
+
+# Conversation states
+AWAITING_NAME = "awaiting_name"
+AWAITING_PROFICIENCY = "awaiting_proficiency"
+FREE_CHAT = "free_chat"
+
+GREETING_MESSAGE = """
+欢迎光临！(huān yíng guāng lín!) 
+请问你叫什么名字呢？(qǐng wèn nǐ jiào shén me míng zi ne?)
+(Welcome to our café! What's your name?) 🌸
+
+Try saying:
+我叫... (wǒ jiào...) - My name is...
+
+---
+Word-by-Word Breakdown:
+欢迎 (huān yíng) - welcome
+光临 (guāng lín) - to visit/attend
+请问 (qǐng wèn) - may I ask
+你 (nǐ) - you
+叫 (jiào) - called
+什么 (shén me) - what
+名字 (míng zi) - name
+呢 (ne) - question particle
+
+Type your name using: 
+我叫 [your name] (wǒ jiào [your name])
+"""
+
+NAME_REPLY_TEMPLATE = """
+你好，{name}！(nǐ hǎo, {name}!) ✨
+
+今天想喝点什么呢？(jīn tiān xiǎng hē diǎn shén me ne?)
+(What would you like to drink today?) ☕
+
+Try these phrases:
+我想要一杯... (wǒ xiǎng yào yī bēi...) - I would like a cup of...
+
+---
+Word-by-Word Breakdown:
+你好 (nǐ hǎo) - hello
+今天 (jīn tiān) - today
+想 (xiǎng) - want to
+喝点 (hē diǎn) - drink something
+什么 (shén me) - what
+呢 (ne) - question particle
+我 (wǒ) - I
+想要 (xiǎng yào) - would like
+一 (yī) - one
+杯 (bēi) - cup (measure word)
+
+Common orders:
+1. 我想要一杯咖啡 
+   (wǒ xiǎng yào yī bēi kā fēi)
+   I would like a coffee
+
+2. 我想要一杯茶 
+   (wǒ xiǎng yào yī bēi chá)
+   I would like a tea
+
+3. 我想要一杯热巧克力
+   (wǒ xiǎng yào yī bēi rè qiǎo kè lì)
+   I would like a hot chocolate
+
+Type your order using one of these phrases!
+(Tell me your level any time — beginner, intermediate, advanced or HSK 1-6 — and I'll match it.)
+"""
+
+# Asked again when the answer to the greeting has no name in it
+NAME_RETRY_MESSAGE = """
+好的！那你叫什么名字呢？(hǎo de! nà nǐ jiào shén me míng zi ne?)
+(Got it! And what's your name?) 🌸
+
+Try saying:
+我叫... (wǒ jiào...) - My name is...
+"""
+NAME_RETRY_SPEECH = "好的！那你叫什么名字呢？"
+
+# "我叫小明", "我是小明", "my name is David", "I'm David", "call me David"
+NAME_PATTERN = re.compile(
+    r"(?:我叫|我是|我的名字是|my name is|i'm|i am|call me)\s*([^\s，。！？,.!?]+)",
+    re.IGNORECASE
+)
+NAME_STRIP_CHARS = " \t\n，。！？,.!?~～"
+MAX_NAME_LENGTH = 30
+# Words that follow "I'm" / "我是" without being a name ("I'm a beginner", "I am new", "我是学生");
+# level words are rejected through PROFICIENCY_PATTERNS
+NOT_NAMES = {
+    "a", "an", "the", "new", "not", "just", "here", "from", "learning", "studying", "still", "really",
+    "very", "so", "ok", "okay", "fine", "good", "ready", "学生", "新人",
+}
+
+# "beginner", "我是初学者", "intermediate", "高级"; HSK levels are checked first
+HSK_PATTERN = re.compile(r"hsk\s*([1-6])", re.IGNORECASE)
+PROFICIENCY_PATTERNS = (
+    ("beginner", re.compile(r"beginner|novice|初学|初级|零基础|入门|新手", re.IGNORECASE)),
+    ("intermediate", re.compile(r"intermediate|中级", re.IGNORECASE)),
+    ("advanced", re.compile(r"advanced|高级", re.IGNORECASE)),
+)
+
+
+def is_name(word):
+    """False for the articles, fillers and level words that follow "I'm" / "我是" in place of a name"""
+    return bool(word) and word.lower() not in NOT_NAMES and extract_proficiency(word) is None
+
+
+def extract_name(message):
+    """Pull the learner's name out of an introduction, or use the whole message.
+
+    Returns None when the message has no name in it ("I'm a beginner").
+    """
+    introduced = False
+    for match in NAME_PATTERN.finditer(message):
+        introduced = True
+        name = match.group(1).strip(NAME_STRIP_CHARS)[:MAX_NAME_LENGTH]
+        if is_name(name):
+            return name
+    if introduced:
+        return None
+    name = message.strip(NAME_STRIP_CHARS)[:MAX_NAME_LENGTH] or message.strip()
+    return name if is_name(name) else None
+
+
+def extract_proficiency(message):
+    """The level a learner states ("beginner", "HSK 3", ...), or None if the message names none"""
+    hsk = HSK_PATTERN.search(message)
+    if hsk:
+        return f"HSK {hsk.group(1)}"
+    for level, pattern in PROFICIENCY_PATTERNS:
+        if pattern.search(message):
+            return level
+    return None
+
+
+def handle_turn(state, message, user_info):
+    """Advance the onboarding state machine for one user message.
+
+    Updates user_info in place and returns (next_state, scripted_reply);
+    scripted_reply is None when the turn should be answered by the LLM.
+    """
+    # Not only in AWAITING_PROFICIENCY: the reply to the drink prompt is usually an order, not a level
+    if not user_info.get("proficiency"):
+        user_info["proficiency"] = extract_proficiency(message)
+    if state == AWAITING_NAME:
+        name = extract_name(message)
+        if name is None:
+            return AWAITING_NAME, NAME_RETRY_MESSAGE
+        user_info["name"] = name
+        return AWAITING_PROFICIENCY, NAME_REPLY_TEMPLATE.format(name=name)
+    return FREE_CHAT, None
@@ -0,0 +1,73 @@
+"""Keyword-based choice of the reaction video shown with a tutor reply.
+
+The keyword table lives under "reactions" in src/config.json:
+
+    {"default": "thinking", "categories": {"appreciation": {"谢谢": 1, "thank": 1}, ...}}
+
+All keywords are compiled into a single alternation, so a message is scanned
+once. Every keyword occurrence adds its weight to its category; the highest
+score wins, ties go to the category listed first, and a message without any
+keyword gets the default.
+"""
+import os
+import re
+import json
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+
+
+def load_reaction_table(path=CONFIG_PATH):
+    """Read the "reactions" section of the config file (empty table if it is missing)"""
+    try:
+        with open(path, encoding="utf-8") as config_file:
+            return json.load(config_file).get("reactions", {})
+    except (OSError, ValueError) as e:
+        logger.warning("no reaction keywords loaded from %s: %s", path, e)
+        return {}
+
+
+class ReactionClassifier:
+    """Scores every category in one pass over the lowercased message"""
+
+    def __init__(self, categories, default="thinking"):
+        self.categories = list(categories)
+        self.default = default
+        # keyword -> (category index, weight); the first category listing a keyword keeps it
+        self._keywords = {}
+        for index, (category, keywords) in enumerate(categories.items()):
+            for keyword, weight in keywords.items():
+                self._keywords.setdefault(keyword.lower(), (index, weight))
+        # Longest first, so a keyword is never shadowed by one of its prefixes
+        alternatives = sorted(self._keywords, key=len, reverse=True)
+        self._pattern = re.compile("|".join(map(re.escape, alternatives))) if alternatives else None
+
+    @classmethod
+    def from_config(cls, path=CONFIG_PATH):
+        table = load_reaction_table(path)
+        return cls(table.get("categories", {}), table.get("default", "thinking"))
+
+    def scores(self, text):
+        """{category: score} for the categories with at least one keyword in text"""
+        totals = {}
+        if self._pattern is None:
+            return totals
+        for match in self._pattern.finditer(text.lower()):
+            index, weight = self._keywords[match.group()]
+            totals[index] = totals.get(index, 0) + weight
+        return {self.categories[index]: score for index, score in totals.items()}
+
+    def classify(self, text):
+        """Category with the highest score, or the default"""
+        totals = self.scores(text)
+        if not totals:
+            return self.default
+        return max(totals, key=lambda category: (totals[category], -self.categories.index(category)))
+
+    def should_show(self, message_count, seed):
+        """Show a video every 3-5 messages; the same seed always gives the same sequence"""
+        rng = random.Random(f"{seed}:{message_count}")
+        return message_count % rng.randint(3, 5) == 0
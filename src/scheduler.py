@@ -0,0 +1,206 @@
+"""Process-wide concurrency gates for API calls, with a fair queue per session.
+
+A RequestGate lets at most `limit` requests run at once. Requests beyond
+that wait in one queue per session, and freed slots go to the sessions in
+round-robin order, so a session with a burst of work (several speech clips,
+a summary plus a reply) cannot starve the others. Once `max_queue` requests
+are waiting, new ones are refused with GateFull instead of piling up behind
+the rate limit; callers turn that into a "busy" message.
+
+Work either blocks the calling thread until its turn (slot) or is handed
+to an executor when its turn comes (submit). Requests that run beyond the
+slot they were started under (a hedged duplicate, a call abandoned after a
+deadline) are counted with occupy, so the gate still sees them.
+"""
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+class GateFull(Exception):
+    """The gate's queue is full, or a request waited longer than the gate's wait_timeout"""
+
+
+class _Ticket:
+    def __init__(self, session_id, job=None):
+        self.session_id = session_id
+        # (future, fn, args, kwargs) for submitted work, None for a blocking slot
+        self.job = job
+        self.granted = threading.Event()
+        self.queued_at = time.monotonic()
+
+
+class RequestGate:
+    """Caps in-flight requests of one kind (e.g. chat or speech) for the whole process"""
+
+    def __init__(self, name, limit, max_queue=100, wait_timeout=60.0, executor=None):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.wait_timeout = wait_timeout
+        self.executor = executor
+        self._lock = threading.Lock()
+        # session_id -> waiting tickets; the dict order is the round-robin order
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._in_flight = 0
+        self.granted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.occupied = 0
+        self.peak_queued = 0
+        self.wait_seconds = 0.0
+
+    def _enqueue(self, ticket):
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise GateFull(f"too many {self.name} requests waiting ({self._queued})")
+        self._queues.setdefault(ticket.session_id, deque()).append(ticket)
+        self._queued += 1
+        self.peak_queued = max(self.peak_queued, self._queued)
+
+    def _grant(self):
+        """Give free slots to waiting tickets, one session at a time; returns the jobs to start"""
+        jobs = []
+        now = time.monotonic()
+        while self._in_flight < self.limit and self._queues:
+            session_id, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            # The session moves to the back of the rotation (or leaves it when it has nothing left)
+            del self._queues[session_id]
+            if queue:
+                self._queues[session_id] = queue
+            self._queued -= 1
+            self._in_flight += 1
+            self.granted += 1
+            self.wait_seconds += now - ticket.queued_at
+            ticket.granted.set()
+            if ticket.job is not None:
+                jobs.append(ticket)
+        return jobs
+
+    def _start(self, jobs):
+        for ticket in jobs:
+            self.executor.submit(self._run, ticket)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            jobs = self._grant()
+        self._start(jobs)
+
+    def _abandon(self, ticket):
+        """Drop a waiting ticket, or free its slot if it was granted in the meantime"""
+        with self._lock:
+            granted = ticket.granted.is_set()
+            if not granted:
+                queue = self._queues[ticket.session_id]
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.session_id]
+                self._queued -= 1
+        if granted:
+            self._release()
+
+    def _run(self, ticket):
+        future, fn, args, kwargs = ticket.job
+        try:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        finally:
+            self._release()
+
+    def _position(self, ticket):
+        """1-based place in line under round-robin order, or None once granted"""
+        queue = self._queues.get(ticket.session_id)
+        if queue is None or ticket not in queue:
+            return None
+        depth = queue.index(ticket)
+        ahead = depth
+        before_own_session = True
+        for session_id, other in self._queues.items():
+            if session_id == ticket.session_id:
+                before_own_session = False
+                continue
+            # Sessions earlier in the rotation get one more turn before this ticket's
+            ahead += min(len(other), depth + 1 if before_own_session else depth)
+        return ahead + 1
+
+    @contextmanager
+    def slot(self, session_id, on_wait=None, poll_interval=0.25):
+        """Hold one slot for the with-block, waiting for this session's turn if the gate is full.
+
+        on_wait(position) is called while waiting whenever the 1-based queue
+        position changes. Yields the seconds spent waiting.
+        """
+        ticket = _Ticket(session_id)
+        with self._lock:
+            self._enqueue(ticket)
+            jobs = self._grant()
+        self._start(jobs)
+
+        shown_position = None
+        try:
+            while not ticket.granted.is_set():
+                with self._lock:
+                    if ticket.granted.is_set():
+                        break
+                    if time.monotonic() - ticket.queued_at > self.wait_timeout:
+                        self.timeouts += 1
+                        raise GateFull(f"waited more than {self.wait_timeout:.0f}s for a {self.name} slot")
+                    position = self._position(ticket)
+                if on_wait and position != shown_position:
+                    on_wait(position)
+                    shown_position = position
+                ticket.granted.wait(poll_interval)
+        except BaseException:
+            # Timed out, or on_wait/the caller was interrupted (e.g. a Streamlit rerun): give up the place
+            self._abandon(ticket)
+            raise
+
+        try:
+            yield time.monotonic() - ticket.queued_at
+        finally:
+            self._release()
+
+    def occupy(self):
+        """Count a request that is already running as in flight, until the returned function is called.
+
+        It never waits, so the gate can briefly run over its limit; queued
+        work is held back until the count is under it again.
+        """
+        with self._lock:
+            self._in_flight += 1
+            self.occupied += 1
+        return self._release
+
+    def submit(self, session_id, fn, *args, **kwargs):
+        """Run fn on the executor when this session's turn comes; returns a Future"""
+        future = Future()
+        with self._lock:
+            self._enqueue(_Ticket(session_id, (future, fn, args, kwargs)))
+            jobs = self._grant()
+        self._start(jobs)
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "sessions_waiting": len(self._queues),
+                "peak_queued": self.peak_queued,
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "occupied": self.occupied,
+                "mean_wait": self.wait_seconds / self.granted if self.granted else 0.0,
+            }
@@ -0,0 +1,286 @@
+"""SQLite-backed persistence for conversations.
+
+Each session's state (user info, onboarding step, context summary), its
+messages and its audio keys are stored in one SQLite database in WAL mode.
+Writes are queued and committed in batches by a background thread, so a
+turn never waits on the disk. ChatHistory is the list-like chat history
+the app keeps in session state: it loads messages from the database in
+pages as they are accessed, and idle histories drop their loaded messages
+to free memory.
+
+Only one owner (a browser tab) writes to a session at a time. It holds a
+lease on the session row (claim); anyone else opening the session while
+the lease is held works on a copy (fork), so two writers never append
+at the same message indices.
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import sqlite3
+import threading
+import weakref
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    message_index INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (session_id, message_index)
+);
+CREATE TABLE IF NOT EXISTS audio (
+    session_id TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    audio_key TEXT NOT NULL,
+    PRIMARY KEY (session_id, message_id)
+);
+"""
+
+# Messages loaded per database read when a history is paged in
+PAGE_SIZE = 50
+# Columns added to the sessions table after its first release: name -> definition
+SESSION_COLUMNS = {"owner": "TEXT", "lease_until": "REAL NOT NULL DEFAULT 0"}
+
+
+class SessionStore:
+    """One SQLite database shared by every session in the process"""
+
+    def __init__(self, path, flush_interval=0.5, batch_size=100):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        for column, definition in SESSION_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} {definition}")
+        # Guards the connection; held while a batch is taken and committed so batches stay in order
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = []
+        self._wake = threading.Event()
+        self._histories = weakref.WeakSet()
+        self._last_sweep = time.monotonic()
+        threading.Thread(target=self._write_loop, name="session-store", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _queue(self, sql, params):
+        with self._pending_lock:
+            self._pending.append((sql, params))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error("session store write failed: %s", e)
+
+    def flush(self):
+        """Commit every queued write in one transaction"""
+        with self._lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            self._conn.execute("BEGIN")
+            try:
+                for sql, params in batch:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _transaction(self, work):
+        """Run work(connection) in one immediate transaction, after every queued write; returns its result"""
+        self.flush()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def _read(self, sql, params):
+        # Reads see every write queued before them
+        self.flush()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def save_session(self, session_id, state):
+        # An upsert, so the lease columns are kept
+        self._queue(
+            "INSERT INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+            (session_id, json.dumps(state, ensure_ascii=False), time.time())
+        )
+
+    def claim(self, session_id, owner, lease_seconds, owner_alive=None):
+        """Take or renew the write lease on a session for owner; False while someone else holds it.
+
+        Another owner's lease counts until it expires, or until
+        owner_alive(other owner) says it has gone (e.g. its tab was closed).
+        A session that isn't stored yet is free; its lease is taken on the
+        next claim after it is first saved.
+        """
+        now = time.time()
+
+        def take(conn):
+            row = conn.execute("SELECT owner, lease_until FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                return True
+            holder, lease_until = row
+            if holder not in (None, owner) and lease_until > now and (owner_alive is None or owner_alive(holder)):
+                return False
+            conn.execute(
+                "UPDATE sessions SET owner = ?, lease_until = ? WHERE session_id = ?",
+                (owner, now + lease_seconds, session_id)
+            )
+            return True
+        return self._transaction(take)
+
+    def fork(self, session_id, new_session_id):
+        """Copy a session's state, messages and audio keys under a new id (with no lease)"""
+        def copy(conn):
+            conn.execute(
+                "INSERT INTO sessions (session_id, state, updated_at) SELECT ?, state, ? FROM sessions WHERE session_id = ?",
+                (new_session_id, time.time(), session_id)
+            )
+            conn.execute(
+                "INSERT INTO messages (session_id, message_index, message) "
+                "SELECT ?, message_index, message FROM messages WHERE session_id = ?",
+                (new_session_id, session_id)
+            )
+            conn.execute(
+                "INSERT INTO audio (session_id, message_id, audio_key) "
+                "SELECT ?, message_id, audio_key FROM audio WHERE session_id = ?",
+                (new_session_id, session_id)
+            )
+        self._transaction(copy)
+
+    def save_message(self, session_id, index, message):
+        self._queue(
+            "INSERT OR REPLACE INTO messages (session_id, message_index, message) VALUES (?, ?, ?)",
+            (session_id, index, json.dumps(message, ensure_ascii=False))
+        )
+
+    def save_audio_key(self, session_id, message_id, audio_key):
+        self._queue(
+            "INSERT OR REPLACE INTO audio (session_id, message_id, audio_key) VALUES (?, ?, ?)",
+            (session_id, message_id, audio_key)
+        )
+
+    def load_session(self, session_id):
+        """(state, message count) of a stored session, or None"""
+        rows = self._read("SELECT state FROM sessions WHERE session_id = ?", (session_id,))
+        if not rows:
+            return None
+        count = self._read("SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,))[0][0]
+        return json.loads(rows[0][0]), count
+
+    def load_messages(self, session_id, start, stop):
+        """{index: message} for start <= index < stop"""
+        rows = self._read(
+            "SELECT message_index, message FROM messages "
+            "WHERE session_id = ? AND message_index >= ? AND message_index < ?",
+            (session_id, start, stop)
+        )
+        return {index: json.loads(message) for index, message in rows}
+
+    def load_audio_keys(self, session_id):
+        rows = self._read("SELECT message_id, audio_key FROM audio WHERE session_id = ?", (session_id,))
+        return dict(rows)
+
+    def history(self, session_id, length=0):
+        """A ChatHistory for the session, tracked for idle eviction"""
+        history = ChatHistory(self, session_id, length)
+        self._histories.add(history)
+        return history
+
+    def evict_idle(self, idle_seconds, sweep_interval=60.0):
+        """Drop loaded messages of histories not accessed for idle_seconds (at most once per sweep_interval)"""
+        now = time.monotonic()
+        if now - self._last_sweep < sweep_interval:
+            return 0
+        self._last_sweep = now
+        evicted = 0
+        for history in list(self._histories):
+            if now - history.last_access > idle_seconds and history.loaded_count():
+                history.evict()
+                evicted += 1
+        return evicted
+
+
+class ChatHistory:
+    """List-like chat history (len, indexing, slicing, iteration, append) paged in from the store"""
+
+    def __init__(self, store, session_id, length=0):
+        self.store = store
+        self.session_id = session_id
+        self._length = length
+        self._loaded = {}
+        self.last_access = time.monotonic()
+
+    def __len__(self):
+        return self._length
+
+    def _messages(self, start, stop):
+        """Messages start..stop-1, loading missing ones a page at a time"""
+        self.last_access = time.monotonic()
+        loaded = self._loaded
+        missing = [index for index in range(start, stop) if index not in loaded]
+        if missing:
+            page_start = max(0, min(missing[0], missing[-1] + 1 - PAGE_SIZE))
+            loaded.update(self.store.load_messages(self.session_id, page_start, missing[-1] + 1))
+        return [loaded[index] for index in range(start, stop)]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return self._messages(0, self._length)[index]
+            return self._messages(start, max(start, stop))
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("chat history index out of range")
+        return self._messages(index, index + 1)[0]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def append(self, message):
+        self.last_access = time.monotonic()
+        index = self._length
+        self._loaded[index] = message
+        self._length += 1
+        self.store.save_message(self.session_id, index, message)
+
+    def loaded_count(self):
+        return len(self._loaded)
+
+    def evict(self):
+        """Free the loaded messages; they are paged back in from the store when accessed"""
+        self.store.flush()
+        self._loaded = {}
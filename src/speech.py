@@ -0,0 +1,151 @@
+"""Speech synthesis backends.
+
+Every backend exposes `model` and `voice` (used in audio cache keys) and a
+`synthesize(text, on_request=None)` method returning encoded audio bytes.
+on_request(backend) is called for every request that produced audio, also
+ones whose audio went unused (hedged duplicates, primary calls that missed
+their deadline), so each billed request can be recorded.
+"""
+import time
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+def audio_format(audio_bytes):
+    """Guess the mime type of synthesized audio from its header"""
+    return "audio/wav" if audio_bytes[:4] == b"RIFF" else "audio/mp3"
+
+
+class OpenAISpeech:
+    """OpenAI text-to-speech endpoint (mp3).
+
+    get_client returns the OpenAI client and is only called on the first
+    synthesis, so audio served from the bundle or cache never loads openai.
+    With a CallPolicy, requests get its timeouts, retries and hedging.
+    """
+
+    def __init__(self, get_client, model="tts-1", voice="nova", policy=None):
+        self.get_client = get_client
+        self.model = model
+        self.voice = voice
+        self.policy = policy
+
+    def _request(self, text, timeout=None, on_request=None):
+        options = {"timeout": timeout} if timeout is not None else {}
+        # Keep the audio in memory; a shared temp file would be clobbered by concurrent sessions
+        response = self.get_client().audio.speech.create(model=self.model, voice=self.voice, input=text, **options)
+        if on_request is not None:
+            on_request(self)
+        return response.content
+
+    def synthesize(self, text, on_request=None):
+        if self.policy is None:
+            return self._request(text, on_request=on_request)
+        return self.policy.call(lambda timeout: self._request(text, timeout, on_request))
+
+
+class EspeakSpeech:
+    """Offline Mandarin voice using the espeak-ng command line tool (wav)"""
+
+    model = "espeak-ng"
+
+    def __init__(self, voice="cmn", executable="espeak-ng", timeout=10):
+        self.voice = voice
+        self.executable = executable
+        self.timeout = timeout
+
+    def is_available(self):
+        return shutil.which(self.executable) is not None
+
+    def synthesize(self, text, on_request=None):
+        result = subprocess.run(
+            [self.executable, "-v", self.voice, "--stdout", text],
+            capture_output=True,
+            check=True,
+            timeout=self.timeout
+        )
+        if on_request is not None:
+            on_request(self)
+        return result.stdout
+
+
+class FallbackSpeech:
+    """Use the primary backend within a latency deadline, otherwise the local one.
+
+    A primary call that misses the deadline keeps running in the background;
+    its result is handed to `on_late_result` (e.g. to warm the cache) and the
+    local backend serves the current request. After a miss or an error, the
+    primary is skipped for `cooldown` seconds so a slow upstream doesn't add
+    the deadline to every turn. With no fallback configured, the primary is
+    called directly. A primary call left running is reported to `occupy`
+    (e.g. RequestGate.occupy), which returns the function to call when it ends.
+    """
+
+    def __init__(self, primary, fallback, deadline=4.0, cooldown=30.0, on_late_result=None, max_workers=4,
+                 occupy=None):
+        self.primary = primary
+        self.fallback = fallback
+        self.deadline = deadline
+        self.cooldown = cooldown
+        self.on_late_result = on_late_result
+        self.occupy = occupy
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-primary")
+        self._lock = threading.Lock()
+        self._skip_primary_until = 0.0
+        self.primary_calls = 0
+        self.fallback_calls = 0
+        self.deadline_misses = 0
+
+    def choose_backend(self):
+        """The backend the next request will try first"""
+        if self.fallback is None:
+            return self.primary
+        with self._lock:
+            return self.primary if time.monotonic() >= self._skip_primary_until else self.fallback
+
+    def _trip(self):
+        with self._lock:
+            self._skip_primary_until = time.monotonic() + self.cooldown
+
+    def synthesize(self, text, on_request=None):
+        """Return (backend used, audio bytes)"""
+        if self.fallback is None:
+            with self._lock:
+                self.primary_calls += 1
+            return self.primary, self.primary.synthesize(text, on_request)
+
+        if self.choose_backend() is self.primary:
+            future = self._executor.submit(self.primary.synthesize, text, on_request)
+            try:
+                audio_bytes = future.result(timeout=self.deadline)
+                with self._lock:
+                    self.primary_calls += 1
+                return self.primary, audio_bytes
+            except FutureTimeoutError:
+                with self._lock:
+                    self.deadline_misses += 1
+                self._trip()
+                release = self.occupy() if self.occupy is not None else None
+                future.add_done_callback(lambda done: self._late_result(text, done, release))
+            except Exception:
+                self._trip()
+
+        with self._lock:
+            self.fallback_calls += 1
+        return self.fallback, self.fallback.synthesize(text, on_request)
+
+    def _late_result(self, text, future, release=None):
+        if release is not None:
+            release()
+        if self.on_late_result and not future.exception():
+            self.on_late_result(self.primary, text, future.result())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "primary_calls": self.primary_calls,
+                "fallback_calls": self.fallback_calls,
+                "deadline_misses": self.deadline_misses,
+            }
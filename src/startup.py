@@ -0,0 +1,51 @@
+"""Cold-start profile of the first script run in a process.
+
+main.py imports this module first, so its load time marks the start of the
+run. With STARTUP_PROFILE=1 the first run prints how long it spent on each
+stage (imports, configuration, session setup, first paint):
+
+    STARTUP_PROFILE=1 streamlit run src/main.py
+
+Per-package import times: python bench/bench_startup.py
+"""
+import os
+import sys
+import time
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0") == "1"
+
+
+class StartupProfile:
+    """Durations between marks, recorded until the first report"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.stages = {}
+        self.done = False
+
+    def mark(self, stage):
+        """Close the stage that ended now (no-op after the first run)"""
+        if self.done:
+            return
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.last
+        self.last = now
+
+    def finish(self):
+        """End the first run; print the breakdown when STARTUP_PROFILE=1"""
+        if self.done:
+            return
+        self.done = True
+        if STARTUP_PROFILE:
+            total = self.last - self.started
+            lines = [f"  {stage:<20} {seconds * 1000:8.1f} ms" for stage, seconds in self.stages.items()]
+            print(
+                "Startup profile (first run in this process):\n" + "\n".join(lines)
+                + f"\n  {'total':<20} {total * 1000:8.1f} ms",
+                file=sys.stderr,
+                flush=True
+            )
+
+
+startup_profile = StartupProfile()
@@ -0,0 +1,144 @@
+"""Asyncio engine for streamed chat turns, one event loop per process.
+
+Every session's completion runs as a task on the same loop with one
+AsyncOpenAI client, so waiting on the API holds no thread. A turn is a small
+task graph:
+
+    completion (streamed) --line--> on_line hooks (e.g. start speech early)
+            |
+            +--reply done--> after_reply tasks, concurrently --> result
+
+The script thread only reads the text as it arrives (StreamingTurn.deltas)
+to draw it, then collects the result. If its run is interrupted it cancels
+the turn (StreamingTurn.cancel), so no work outlives the turn's chat slot.
+Hooks run on the loop and must not block; after_reply tasks are plain
+functions and run in worker threads.
+"""
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+
+# Put on a turn's delta queue when the completion has ended (either way)
+_END = object()
+
+
+class EventLoopThread:
+    """An asyncio event loop running forever on a daemon thread"""
+
+    def __init__(self, name="turn-engine"):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name=name, daemon=True).start()
+
+    def call(self, callback, *args):
+        """Run a callback on the loop from any thread"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+
+class StreamingTurn:
+    """A turn running on the engine loop, as seen from the script thread"""
+
+    def __init__(self, loop_thread):
+        self._loop_thread = loop_thread
+        self._deltas = queue.Queue()
+        self._task = None
+        self.future = Future()
+        # Set once the task is done, including when it was cancelled before it started
+        self.finished = threading.Event()
+
+    def _start(self, coroutine):
+        # On the loop
+        self._task = asyncio.ensure_future(coroutine)
+        self._task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        if task.cancelled():
+            self.future.cancel()
+        elif task.exception() is not None:
+            self.future.set_exception(task.exception())
+        else:
+            self.future.set_result(task.result())
+        self._deltas.put(_END)
+        self.finished.set()
+
+    def deltas(self):
+        """Reply text chunks as they arrive, until the completion ends"""
+        while True:
+            delta = self._deltas.get()
+            if delta is _END:
+                return
+            yield delta
+
+    def result(self, timeout=None):
+        """(text, usage, {after_reply name: value}); raises the turn's error"""
+        return self.future.result(timeout)
+
+    def cancel(self, timeout=None):
+        """Cancel the turn and wait until its task has actually stopped; True once it has"""
+        # Queued behind _start on the loop, so the task exists by then
+        self._loop_thread.call(lambda: self._task.cancel())
+        return self.finished.wait(timeout)
+
+
+class TurnEngine:
+    """Runs streamed completions and their dependent work on one shared event loop.
+
+    create_client returns an AsyncOpenAI client; it is called on the loop
+    the first time it is needed, because the client must belong to that loop.
+    With a CallPolicy, opening the stream gets its timeouts and retries.
+    """
+
+    def __init__(self, create_client, policy=None):
+        self.create_client = create_client
+        self.policy = policy
+        self._client = None
+        self._loop_thread = EventLoopThread()
+
+    def start(self, request, on_line=None, after_reply=None):
+        """Start a streamed completion for chat.completions.create(**request) and return its StreamingTurn.
+
+        on_line(line, text_so_far) is called on the loop for each completed
+        line. after_reply maps names to functions of the full reply text that
+        run concurrently once it is complete.
+        """
+        turn = StreamingTurn(self._loop_thread)
+        self._loop_thread.call(turn._start, self._run(turn, request, on_line, after_reply or {}))
+        return turn
+
+    async def _run(self, turn, request, on_line, after_reply):
+        try:
+            text, usage = await self._stream(turn, request, on_line)
+        finally:
+            turn._deltas.put(_END)
+        values = await asyncio.gather(*(asyncio.to_thread(task, text) for task in after_reply.values()))
+        return text, usage, dict(zip(after_reply, values))
+
+    async def _open(self, request, timeout=None):
+        if self._client is None:
+            self._client = self.create_client()
+        options = {"timeout": timeout} if timeout is not None else {}
+        return await self._client.chat.completions.create(stream=True, **request, **options)
+
+    async def _stream(self, turn, request, on_line):
+        if self.policy is None:
+            stream = await self._open(request)
+        else:
+            stream = await self.policy.call_async(lambda timeout: self._open(request, timeout))
+
+        text = ""
+        pending_line = ""
+        usage = None
+        async for chunk in stream:
+            # The final chunk carries usage and no choices
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            delta = chunk.choices[0].delta.content
+            text += delta
+            turn._deltas.put(delta)
+            if on_line is not None:
+                *lines, pending_line = (pending_line + delta).split('\n')
+                for line in lines:
+                    on_line(line, text)
+        return text, usage
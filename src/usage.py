@@ -0,0 +1,123 @@
+"""Token, character and cost accounting for every API call, per session and per process"""
+import json
+import time
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+# Capacity-planning log, one JSON line per call (see configure_usage_log)
+ledger = logging.getLogger(__name__ + ".ledger")
+ledger.propagate = False
+
+# USD per 1M tokens: (prompt, cached prompt, completion)
+COMPLETION_PRICES = {
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+}
+# USD per 1M input characters
+SPEECH_PRICES = {
+    "tts-1": 15.00,
+    "tts-1-hd": 30.00,
+}
+
+COUNTERS = ("requests", "prompt_tokens", "cached_tokens", "completion_tokens", "characters", "cost")
+
+
+def cached_prompt_tokens(usage):
+    """Prompt tokens served from the provider's prefix cache (0 when not reported)"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def completion_cost(model, prompt_tokens, cached_tokens, completion_tokens):
+    """USD for one completion (0 for models without a known price)"""
+    prompt_price, cached_price, completion_price = COMPLETION_PRICES.get(model, (0, 0, 0))
+    return (
+        (prompt_tokens - cached_tokens) * prompt_price
+        + cached_tokens * cached_price
+        + completion_tokens * completion_price
+    ) / 1_000_000
+
+
+def configure_usage_log(path, max_bytes=10_000_000, backup_count=5):
+    """Write the usage ledger to a size-rotated file"""
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    ledger.addHandler(handler)
+    ledger.setLevel(logging.INFO)
+
+
+class UsageTotals:
+    """Counters per purpose ("chat_turn", "summary", "tts", ...); safe to update from worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_purpose = {}
+
+    def add(self, purpose, **counts):
+        with self._lock:
+            totals = self._by_purpose.setdefault(purpose, dict.fromkeys(COUNTERS, 0))
+            totals["requests"] += 1
+            for name, value in counts.items():
+                totals[name] += value
+
+    def by_purpose(self):
+        with self._lock:
+            return {purpose: dict(totals) for purpose, totals in self._by_purpose.items()}
+
+    def totals(self):
+        combined = dict.fromkeys(COUNTERS, 0)
+        for totals in self.by_purpose().values():
+            for name in COUNTERS:
+                combined[name] += totals[name]
+        prompt_tokens = combined["prompt_tokens"]
+        combined["cache_hit_rate"] = combined["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+        return combined
+
+
+class UsageTracker:
+    """Process-wide usage; each record also updates the calling session's UsageTotals"""
+
+    def __init__(self):
+        self.process = UsageTotals()
+
+    def _add(self, session, purpose, fields, **counts):
+        self.process.add(purpose, **counts)
+        if session is not None:
+            session.add(purpose, **counts)
+        if ledger.handlers:
+            ledger.info(json.dumps(dict(fields, ts=round(time.time(), 3), purpose=purpose, **counts), ensure_ascii=False))
+
+    def record(self, purpose, model, usage, session=None, **fields):
+        """Record one completion's usage and return its per-request numbers"""
+        if usage is None:
+            return None
+        prompt_tokens = usage.prompt_tokens or 0
+        cached_tokens = cached_prompt_tokens(usage)
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        cost = completion_cost(model, prompt_tokens, cached_tokens, completion_tokens)
+        self._add(
+            session, purpose, dict(fields, model=model),
+            prompt_tokens=prompt_tokens, cached_tokens=cached_tokens,
+            completion_tokens=completion_tokens, cost=cost
+        )
+        logger.info(
+            "completion purpose=%s prompt_tokens=%d cached_tokens=%d completion_tokens=%d",
+            purpose, prompt_tokens, cached_tokens, completion_tokens
+        )
+        return {"prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens, "completion_tokens": completion_tokens}
+
+    def record_speech(self, model, text, session=None, **fields):
+        """Record one synthesis request, billed by input characters"""
+        characters = len(text)
+        cost = characters * SPEECH_PRICES.get(model, 0) / 1_000_000
+        self._add(session, "tts", dict(fields, model=model), characters=characters, cost=cost)
+
+    def record_request(self, purpose, session=None, **fields):
+        """Record a call without billable usage (e.g. the health check)"""
+        self._add(session, purpose, fields)
+
+    def stats(self):
+        return self.process.totals()
@@ -0,0 +1,120 @@
+"""Local, web-optimized renditions of the greeting and reaction videos.
+
+Original clips are ingested into src/assets/mp4 and transcoded into small
+H.264 renditions plus poster frames under src/static/mp4, which Streamlit
+serves at app/static/ (static serving is enabled in .streamlit/config.toml).
+Rendition file names carry a content hash, so they can be cached forever.
+Rebuild after adding or replacing a clip (needs ffmpeg):
+
+    python src/video_assets.py
+"""
+import os
+import json
+import hashlib
+import subprocess
+import urllib.request
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(SRC_DIR, "assets", "mp4")
+RENDITION_DIR = os.path.join(SRC_DIR, "static", "mp4")
+MANIFEST_PATH = os.path.join(RENDITION_DIR, "manifest.json")
+STATIC_URL_PREFIX = "app/static/mp4"
+
+# Remote originals, also used directly until the renditions have been built
+VIDEO_SOURCES = {
+    "greeting": "https://i.imgur.com/lNH72gk.mp4",
+    "appreciation": "https://i.imgur.com/kDA2aub.mp4",
+    "crying": "https://i.imgur.com/CjCaHt2.mp4",
+    "cheering": "https://i.imgur.com/cMD0EoE.mp4",
+    "sighing": "https://i.imgur.com/E0rQas1.mp4",
+    "thinking": "https://i.imgur.com/KPxXcZA.mp4"
+}
+
+# Matches the 320px wide player; no audio track since the videos play muted
+RENDITION_WIDTH = 320
+RENDITION_CRF = 28
+
+
+def load_video_sources():
+    """Return {name: {"url": ..., "poster": ...}}, preferring local renditions"""
+    sources = {name: {"url": url, "poster": None} for name, url in VIDEO_SOURCES.items()}
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return sources
+
+    for name, entry in manifest.items():
+        if os.path.exists(os.path.join(RENDITION_DIR, entry["video"])):
+            sources[name] = {
+                "url": f"{STATIC_URL_PREFIX}/{entry['video']}",
+                "poster": f"{STATIC_URL_PREFIX}/{entry['poster']}"
+            }
+    return sources
+
+
+def fetch_original(name, url):
+    """Download a remote clip into SOURCE_DIR unless it is already there"""
+    source_path = os.path.join(SOURCE_DIR, f"{name}.mp4")
+    if not os.path.exists(source_path):
+        tmp_path = source_path + ".part"
+        urllib.request.urlretrieve(url, tmp_path)
+        os.replace(tmp_path, source_path)
+    return source_path
+
+
+def transcode(source_path, name):
+    """Write a small faststart H.264 rendition and a poster frame; returns their file names"""
+    tmp_path = os.path.join(RENDITION_DIR, f"{name}.tmp.mp4")
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error", "-i", source_path,
+        "-vf", f"scale={RENDITION_WIDTH}:-2",
+        "-c:v", "libx264", "-preset", "slow", "-crf", str(RENDITION_CRF),
+        "-pix_fmt", "yuv420p", "-movflags", "+faststart", "-an",
+        tmp_path
+    ], check=True)
+
+    with open(tmp_path, "rb") as video_file:
+        digest = hashlib.sha256(video_file.read()).hexdigest()[:10]
+    video_name = f"{name}-{digest}.mp4"
+    poster_name = f"{name}-{digest}.jpg"
+    os.replace(tmp_path, os.path.join(RENDITION_DIR, video_name))
+
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error", "-i", os.path.join(RENDITION_DIR, video_name),
+        "-frames:v", "1", "-q:v", "5",
+        os.path.join(RENDITION_DIR, poster_name)
+    ], check=True)
+    return {"video": video_name, "poster": poster_name}
+
+
+def build_renditions():
+    """Ingest every known clip (plus any extra .mp4 in SOURCE_DIR) and rewrite the manifest"""
+    os.makedirs(SOURCE_DIR, exist_ok=True)
+    os.makedirs(RENDITION_DIR, exist_ok=True)
+
+    source_paths = {name: fetch_original(name, url) for name, url in VIDEO_SOURCES.items()}
+    for file_name in sorted(os.listdir(SOURCE_DIR)):
+        name, extension = os.path.splitext(file_name)
+        if extension == ".mp4" and name not in source_paths:
+            source_paths[name] = os.path.join(SOURCE_DIR, file_name)
+
+    manifest = {}
+    for name, source_path in source_paths.items():
+        manifest[name] = transcode(source_path, name)
+        original_size = os.path.getsize(source_path)
+        rendition_size = os.path.getsize(os.path.join(RENDITION_DIR, manifest[name]["video"]))
+        print(f"✅ {name}: {original_size // 1024} KB -> {rendition_size // 1024} KB")
+
+    # Drop renditions from previous builds
+    current_files = {file_name for entry in manifest.values() for file_name in entry.values()}
+    for file_name in os.listdir(RENDITION_DIR):
+        if file_name != "manifest.json" and file_name not in current_files:
+            os.remove(os.path.join(RENDITION_DIR, file_name))
+
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+
+if __name__ == "__main__":
+    build_renditions()
@@ -0,0 +1,61 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_cache import DISK_LOW_WATER, AudioCache, make_audio_key
+
+
+def disk_bytes(cache_dir):
+    return sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.name.endswith(".audio"))
+
+
+def test_audio_key_ignores_whitespace_but_not_voice():
+    assert make_audio_key("tts-1", "nova", "你好  吗") == make_audio_key("tts-1", "nova", " 你好 吗\n")
+    assert make_audio_key("tts-1", "nova", "你好") != make_audio_key("tts-1", "alloy", "你好")
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), max_memory_items=2)
+    cache.put("a", b"A")
+    cache.put("b", b"B")
+    assert cache.get("a") == b"A"
+    cache.put("c", b"C")
+
+    # "b" was least recently used, so it left memory; it is still on disk
+    assert list(cache._memory) == ["a", "c"]
+    assert cache.get("b") == b"B"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_hit_is_promoted_to_memory(tmp_path):
+    AudioCache(str(tmp_path)).put("a", b"audio")
+    cache = AudioCache(str(tmp_path))
+
+    assert cache.get("a") == b"audio"
+    assert cache.get("a") == b"audio"
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 2 / 3
+
+
+def test_disk_tier_evicts_oldest_files_below_its_budget(tmp_path):
+    cache = AudioCache(str(tmp_path), max_memory_items=1, max_disk_bytes=1000)
+    for index in range(4):
+        cache.put(f"k{index}", b"x" * 300)
+        # Distinct access times, oldest first
+        os.utime(cache._path(f"k{index}"), (time.time() - 100 + index, time.time() - 100 + index))
+
+    assert disk_bytes(tmp_path) <= 1000 * DISK_LOW_WATER
+    assert cache.stats()["disk_bytes"] == disk_bytes(tmp_path)
+    assert not os.path.exists(cache._path("k0"))
+    assert os.path.exists(cache._path("k3"))
+
+
+def test_concurrent_puts_over_budget_do_not_fail(tmp_path):
+    cache = AudioCache(str(tmp_path), max_memory_items=1, max_disk_bytes=2000)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda index: cache.put(f"k{index}", b"x" * 100), range(400)))
+
+    assert disk_bytes(tmp_path) <= 2000 + 8 * 100
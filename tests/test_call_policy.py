@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from call_policy import CallPolicy, DeadlineExceeded, is_retryable, retry_after
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def failing(errors, result="ok"):
+    """A request raising the given errors in turn, then returning result; records its timeouts"""
+    errors = list(errors)
+    timeouts = []
+
+    def request(timeout):
+        timeouts.append(timeout)
+        if errors:
+            raise errors.pop(0)
+        return result
+    request.timeouts = timeouts
+    return request
+
+
+def test_retryable_errors():
+    assert is_retryable(TimeoutError())
+    assert is_retryable(StatusError(429))
+    assert is_retryable(StatusError(503))
+    assert not is_retryable(StatusError(400))
+    assert not is_retryable(ValueError())
+
+
+def test_retry_after_header():
+    assert retry_after(StatusError(429, {"retry-after": "2"})) == 2.0
+    assert retry_after(StatusError(429)) is None
+
+
+def test_backoff_honours_retry_after_up_to_max_delay():
+    policy = CallPolicy("t", base_delay=0.01, max_delay=5.0)
+    assert policy.backoff(1, StatusError(429, {"retry-after": "3"})) == 3.0
+    assert policy.backoff(1, StatusError(429, {"retry-after": "60"})) == 5.0
+    assert 0 <= policy.backoff(3) <= 0.04
+
+
+def test_retries_until_success():
+    policy = CallPolicy("t", base_delay=0.001, max_attempts=3)
+    request = failing([TimeoutError(), StatusError(502)])
+
+    assert policy.call(request) == "ok"
+    assert len(request.timeouts) == 3
+    assert policy.counts["retries"] == 2
+    assert policy.counts["failures"] == 0
+
+
+def test_non_retryable_error_is_raised_at_once():
+    policy = CallPolicy("t", base_delay=0.001)
+    request = failing([StatusError(400)])
+
+    with pytest.raises(StatusError):
+        policy.call(request)
+    assert len(request.timeouts) == 1
+    assert policy.counts["failures"] == 1
+
+
+def test_gives_up_after_max_attempts():
+    policy = CallPolicy("t", base_delay=0.001, max_attempts=2)
+
+    with pytest.raises(TimeoutError):
+        policy.call(failing([TimeoutError()] * 5))
+    assert policy.counts["attempts"] == 2
+
+
+def test_attempt_timeout_is_capped_by_the_deadline():
+    policy = CallPolicy("t", timeout=30.0, deadline=0.5)
+    request = failing([])
+
+    policy.call(request)
+    assert request.timeouts[0] <= 0.5
+
+
+def test_deadline_stops_retrying():
+    policy = CallPolicy("t", timeout=0.05, deadline=0.05, base_delay=0.001, max_attempts=100)
+
+    def slow(timeout):
+        time.sleep(timeout)
+        raise TimeoutError()
+
+    with pytest.raises((DeadlineExceeded, TimeoutError)):
+        policy.call(slow)
+    assert policy.counts["failures"] == 1
+
+
+def test_call_async_retries():
+    policy = CallPolicy("t", base_delay=0.001)
+    request = failing([TimeoutError()])
+
+    async def async_request(timeout):
+        return request(timeout)
+
+    assert asyncio.run(policy.call_async(async_request)) == "ok"
+    assert policy.counts["retries"] == 1
+
+
+def hedged_policy(**kwargs):
+    policy = CallPolicy("t", timeout=5.0, hedge_percentile=0.5, hedge_min_samples=1, **kwargs)
+    policy._observe(0.02)
+    return policy
+
+
+def test_slow_request_gets_a_duplicate_that_can_win():
+    occupied = []
+    released = []
+
+    def occupy():
+        occupied.append(1)
+        return lambda: released.append(1)
+
+    policy = hedged_policy(occupy=occupy)
+    calls = []
+    first_done = threading.Event()
+
+    def request(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            first_done.wait(2)
+            return "first"
+        return "second"
+
+    assert policy.call(request) == "second"
+    assert policy.counts["hedges"] == 1
+    assert policy.counts["hedge_wins"] == 1
+    # The duplicate, then the abandoned first request, were counted against the gate
+    assert len(occupied) == 2
+    first_done.set()
+    deadline = time.monotonic() + 2
+    while len(released) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(released) == 2
+
+
+def test_fast_request_is_not_hedged():
+    policy = hedged_policy()
+
+    assert policy.call(lambda timeout: "ok") == "ok"
+    assert policy.counts["hedges"] == 0
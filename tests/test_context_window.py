@@ -0,0 +1,83 @@
+import sys
+from types import SimpleNamespace
+
+import context_window
+from context_window import count_message_tokens, plan_context, update_summary
+
+
+def conversation(turns):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"question {i}"})
+        history.append({"role": "assistant", "content": f"answer {i}"})
+    return history
+
+
+def prompt_tokens(history, start, fixed_tokens):
+    return fixed_tokens + sum(count_message_tokens(m) for m in history[start:])
+
+
+def test_short_history_is_sent_whole():
+    history = conversation(2)
+    assert plan_context(history, 0, fixed_tokens=100, budget=10_000, recent_messages=6, fold_batch=4) == 0
+
+
+def test_folding_waits_for_a_full_batch():
+    history = conversation(4)
+    # Two messages have aged out of the recent window, fewer than the batch
+    assert plan_context(history, 0, fixed_tokens=100, budget=10_000, recent_messages=6, fold_batch=4) == 0
+    # Four have
+    history = conversation(5)
+    assert plan_context(history, 0, fixed_tokens=100, budget=10_000, recent_messages=6, fold_batch=4) == 4
+
+
+def test_folding_resumes_after_the_summarized_messages():
+    history = conversation(7)
+    assert plan_context(history, 4, fixed_tokens=100, budget=10_000, recent_messages=6, fold_batch=4) == 8
+
+
+def test_budget_folds_more_than_the_recent_window_allows():
+    history = conversation(5)
+    budget = prompt_tokens(history, 6, fixed_tokens=100)
+    start = plan_context(history, 0, fixed_tokens=100, budget=budget, recent_messages=10, fold_batch=4)
+    assert start == 6
+    assert prompt_tokens(history, start, fixed_tokens=100) <= budget
+
+
+def test_newest_message_is_kept_even_over_budget():
+    history = conversation(3)
+    assert plan_context(history, 0, fixed_tokens=100, budget=1, recent_messages=6, fold_batch=4) == len(history) - 1
+
+
+def test_update_summary_sends_the_current_summary_and_transcript():
+    requests = []
+
+    def create(**request):
+        requests.append(request)
+        message = SimpleNamespace(content="  Learner Ming ordered a latte.  ")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage="usage")
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    messages = [{"role": "user", "content": "一杯拿铁"}, {"role": "assistant", "content": "好的！"}]
+
+    summary, usage = update_summary(client, "model", "Learner is Ming.", messages, max_tokens=50)
+
+    assert (summary, usage) == ("Learner Ming ordered a latte.", "usage")
+    prompt = requests[0]["messages"][-1]["content"]
+    assert "Learner is Ming." in prompt
+    assert "Learner: 一杯拿铁\nTutor: 好的！" in prompt
+    assert requests[0]["max_tokens"] == 50
+
+
+def test_token_counts_fall_back_to_an_estimate_when_the_encoding_cannot_load(monkeypatch):
+    def get_encoding(name):
+        raise ConnectionError("no network")
+
+    monkeypatch.setitem(sys.modules, "tiktoken", SimpleNamespace(get_encoding=get_encoding))
+    context_window._encoding.cache_clear()
+    context_window.count_tokens.cache_clear()
+    try:
+        assert context_window.count_tokens("你好 abcd") == 2 + 2
+    finally:
+        context_window._encoding.cache_clear()
+        context_window.count_tokens.cache_clear()
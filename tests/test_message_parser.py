@@ -0,0 +1,84 @@
+from message_parser import (
+    BLANK, CHINESE, NUMBERED, SCENE, TEXT, Suggestion, classify_line, ends_reply, format_message, is_pinyin,
+    parse_lines, parse_message, parse_structured, speech_text
+)
+
+REPLY = """*茜茜微笑着点头* 😊
+好的，一杯拿铁！(hǎo de, yī bēi ná tiě!)
+(Okay, one latte!)
+
+---
+👉 Try one of these responses:
+
+1. 谢谢！(xiè xie!)
+   Thank you!
+2. 多少钱？(duō shǎo qián?)
+   How much is it?
+
+Word-by-Word Breakdown:
+拿铁 (ná tiě) - latte
+谢谢 (xiè xie) - thank you
+"""
+
+
+def test_reply_fields():
+    parsed = parse_lines(REPLY)
+
+    assert parsed.scene == "*茜茜微笑着点头* 😊"
+    assert parsed.chinese == ["好的，一杯拿铁！"]
+    assert parsed.pinyin == ["hǎo de, yī bēi ná tiě!"]
+    assert parsed.translation == ["Okay, one latte!"]
+    assert parsed.suggestions == [
+        Suggestion("谢谢！", "xiè xie!", "Thank you!"),
+        Suggestion("多少钱？", "duō shǎo qián?", "How much is it?"),
+    ]
+    assert parsed.words == [("拿铁", "ná tiě", "latte"), ("谢谢", "xiè xie", "thank you")]
+
+
+def test_speech_text_is_the_tutors_own_sentences():
+    assert speech_text(parse_lines(REPLY)) == "好的，一杯拿铁！"
+    assert speech_text(parse_lines("你好，[name]！(nǐ hǎo!)"), "小明") == "你好，小明！"
+
+
+def test_classify_line():
+    assert classify_line("好的！(hǎo de!)") == CHINESE
+    assert classify_line("*smiles*") == SCENE
+    assert classify_line("2. Something") == NUMBERED
+    assert classify_line("Hello") == TEXT
+    assert classify_line("   ") == BLANK
+
+
+def test_ends_reply_at_the_suggestions_or_breakdown():
+    assert not ends_reply("好的，一杯拿铁！(hǎo de, yī bēi ná tiě!)")
+    assert not ends_reply("(Okay, one latte!)")
+    assert ends_reply("---")
+    assert ends_reply("Word-by-Word Breakdown:")
+    assert ends_reply("1. 谢谢！(xiè xie!)")
+
+
+def test_is_pinyin():
+    assert is_pinyin("nǐ hǎo")
+    assert not is_pinyin("Welcome to our café!")
+
+
+def test_parse_message_is_cached():
+    assert parse_message(REPLY) is parse_message(REPLY)
+
+
+def test_structured_reply():
+    parsed = parse_structured(
+        '{"scene": "smiles", "chinese": "你好", "pinyin": "nǐ hǎo", "english": "Hello",'
+        ' "suggestions": [{"chinese": "谢谢", "pinyin": "xiè xie", "english": "Thanks"}],'
+        ' "vocab": [{"word": "你好", "pinyin": "nǐ hǎo", "meaning": "hello"}]}'
+    )
+
+    assert (parsed.scene, parsed.chinese, parsed.pinyin, parsed.translation) == ("smiles", ["你好"], ["nǐ hǎo"], ["Hello"])
+    assert parsed.suggestions == [Suggestion("谢谢", "xiè xie", "Thanks")]
+    formatted = format_message(parsed)
+    assert "*smiles*" in formatted
+    assert "🗣 1. 谢谢 (xiè xie)" in formatted
+    assert "你好 (nǐ hǎo) - hello" in formatted
+
+
+def test_structured_parser_falls_back_to_text():
+    assert parse_structured(REPLY).chinese == ["好的，一杯拿铁！"]
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from metrics import COUNTER_NAME, METRIC_NAME, Histogram, LatencyMetrics, summarize_jsonl
+
+
+def test_histogram_buckets_by_upper_bound():
+    histogram = Histogram(buckets=(0.1, 1.0, float("inf")))
+    for seconds in (0.05, 0.1, 0.5, 2.0, 30.0):
+        histogram.observe(seconds)
+
+    assert histogram.counts == [2, 1, 2]
+    assert histogram.count == 5
+    assert histogram.sum == pytest.approx(32.65)
+
+
+def test_quantile_interpolates_inside_the_bucket():
+    histogram = Histogram(buckets=(1.0, 2.0, float("inf")))
+    assert histogram.quantile(0.5) is None
+    for seconds in (0.5, 1.5, 1.5, 1.5):
+        histogram.observe(seconds)
+
+    assert histogram.quantile(0.25) == pytest.approx(1.0)
+    assert histogram.quantile(0.5) == pytest.approx(1 + 1 / 3)
+    histogram.observe(50.0)
+    # The open-ended bucket reports its lower bound
+    assert histogram.quantile(1.0) == 2.0
+
+
+def test_turn_spans_are_recorded_per_kind_and_stage(tmp_path):
+    jsonl = tmp_path / "turns.jsonl"
+    metrics = LatencyMetrics(jsonl_path=str(jsonl))
+    turn = metrics.turn("llm")
+    turn.add("completion", 0.2)
+    turn.add("completion", 0.1)
+    turn.finish(session_id="s1")
+
+    stats = metrics.stats()
+    assert set(stats) == {"llm.completion", "llm.total"}
+    assert stats["llm.completion"]["count"] == 1
+    assert stats["llm.completion"]["mean"] == pytest.approx(0.3)
+    entry = json.loads(jsonl.read_text(encoding="utf-8"))
+    assert entry["kind"] == "llm" and entry["session_id"] == "s1"
+    assert entry["stages"]["completion"] == pytest.approx(0.3)
+    assert summarize_jsonl(str(jsonl))["llm.completion"]["p50"] == pytest.approx(0.3)
+
+
+def test_prometheus_exposition(tmp_path):
+    path = tmp_path / "chat.prom"
+    metrics = LatencyMetrics(prometheus_path=str(path))
+    metrics.observe("api.chat", 0.02)
+    metrics.observe("api.chat", 3.0)
+    metrics.count("chat.retries")
+    metrics.count("chat.retries")
+    metrics.write_prometheus(str(path))
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines[:2] == [
+        f"# HELP {METRIC_NAME} Duration of chat pipeline stages.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    # Buckets are cumulative and end at +Inf
+    assert f'{METRIC_NAME}_bucket{{stage="api.chat",le="0.01"}} 0' in lines
+    assert f'{METRIC_NAME}_bucket{{stage="api.chat",le="0.025"}} 1' in lines
+    assert f'{METRIC_NAME}_bucket{{stage="api.chat",le="2.5"}} 1' in lines
+    assert f'{METRIC_NAME}_bucket{{stage="api.chat",le="5.0"}} 2' in lines
+    assert f'{METRIC_NAME}_bucket{{stage="api.chat",le="+Inf"}} 2' in lines
+    assert f'{METRIC_NAME}_sum{{stage="api.chat"}} 3.020000' in lines
+    assert f'{METRIC_NAME}_count{{stage="api.chat"}} 2' in lines
+    assert f"# TYPE {COUNTER_NAME} counter" in lines
+    assert f'{COUNTER_NAME}{{event="chat.retries"}} 2' in lines
@@ -0,0 +1,75 @@
+import pytest
+
+from onboarding import (
+    AWAITING_NAME, AWAITING_PROFICIENCY, FREE_CHAT, NAME_RETRY_MESSAGE, extract_name, extract_proficiency, handle_turn
+)
+
+
+@pytest.mark.parametrize("message, name", [
+    ("我叫小明", "小明"),
+    ("我是小明。", "小明"),
+    ("My name is David!", "David"),
+    ("call me Ana", "Ana"),
+    ("Lin", "Lin"),
+    ("I'm a beginner, my name is Ana", "Ana"),
+    ("I am new here. Call me Wei", "Wei"),
+])
+def test_extract_name(message, name):
+    assert extract_name(message) == name
+
+
+@pytest.mark.parametrize("message, level", [
+    ("beginner", "beginner"),
+    ("我是初学者", "beginner"),
+    ("I'm intermediate", "intermediate"),
+    ("高级", "advanced"),
+    ("I passed HSK 4", "HSK 4"),
+    ("我想要一杯拿铁", None),
+])
+def test_extract_proficiency(message, level):
+    assert extract_proficiency(message) == level
+
+
+@pytest.mark.parametrize("message", [
+    "I'm a beginner",
+    "I am new",
+    "I'm the student",
+    "我是初学者",
+    "我是学生",
+    "intermediate",
+])
+def test_introduction_without_a_name(message):
+    assert extract_name(message) is None
+
+
+def test_name_turn_is_scripted():
+    user_info = {"name": None, "proficiency": None}
+
+    state, reply = handle_turn(AWAITING_NAME, "我叫小明", user_info)
+
+    assert state == AWAITING_PROFICIENCY
+    assert "小明" in reply
+    assert user_info["name"] == "小明"
+
+
+def test_drink_order_is_not_taken_as_the_level():
+    user_info = {"name": "小明", "proficiency": None}
+
+    assert handle_turn(AWAITING_PROFICIENCY, "我想要一杯拿铁", user_info) == (FREE_CHAT, None)
+    assert user_info["proficiency"] is None
+
+    handle_turn(FREE_CHAT, "I'm a beginner, please go slowly", user_info)
+    assert user_info["proficiency"] == "beginner"
+    handle_turn(FREE_CHAT, "that was advanced vocabulary!", user_info)
+    assert user_info["proficiency"] == "beginner"
+
+
+def test_name_is_asked_again_when_the_answer_has_none():
+    user_info = {"name": None, "proficiency": None}
+
+    assert handle_turn(AWAITING_NAME, "I'm a beginner", user_info) == (AWAITING_NAME, NAME_RETRY_MESSAGE)
+    assert user_info == {"name": None, "proficiency": "beginner"}
+
+    state, reply = handle_turn(AWAITING_NAME, "我叫小明", user_info)
+    assert state == AWAITING_PROFICIENCY
+    assert user_info == {"name": "小明", "proficiency": "beginner"}
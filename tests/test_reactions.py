@@ -0,0 +1,52 @@
+import json
+
+from reactions import ReactionClassifier
+
+
+CATEGORIES = {
+    "appreciation": {"谢谢": 1, "thank": 1},
+    "cheering": {"太好了": 2, "great": 1},
+    "crying": {"对不起": 1, "sorry": 1},
+}
+
+
+def test_highest_score_wins():
+    classifier = ReactionClassifier(CATEGORIES)
+    assert classifier.classify("谢谢！太好了！") == "cheering"
+    assert classifier.scores("Thank you, thank you!") == {"appreciation": 2}
+
+
+def test_ties_go_to_the_category_listed_first():
+    classifier = ReactionClassifier(CATEGORIES)
+    assert classifier.classify("sorry, and thank you") == "appreciation"
+
+
+def test_message_without_keywords_gets_the_default():
+    assert ReactionClassifier(CATEGORIES, default="thinking").classify("你好") == "thinking"
+    assert ReactionClassifier({}).classify("谢谢") == "thinking"
+
+
+def test_longer_keyword_is_not_shadowed_by_its_prefix():
+    classifier = ReactionClassifier({"a": {"好": 1}, "b": {"太好了": 5}})
+    assert classifier.classify("太好了") == "b"
+
+
+def test_from_config(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"reactions": {"default": "sighing", "categories": CATEGORIES}}), encoding="utf-8")
+
+    classifier = ReactionClassifier.from_config(str(path))
+
+    assert classifier.classify("谢谢") == "appreciation"
+    assert classifier.classify("hmm") == "sighing"
+
+
+def test_missing_config_gives_an_empty_table(tmp_path):
+    assert ReactionClassifier.from_config(str(tmp_path / "missing.json")).classify("谢谢") == "thinking"
+
+
+def test_should_show_is_reproducible_per_seed():
+    classifier = ReactionClassifier(CATEGORIES)
+    shown = [classifier.should_show(count, "seed") for count in range(30)]
+    assert shown == [classifier.should_show(count, "seed") for count in range(30)]
+    assert any(shown) and not all(shown)
@@ -0,0 +1,128 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pytest
+
+from scheduler import GateFull, RequestGate
+
+
+def hold_slot(gate, session_id, release):
+    """Occupy a slot from another thread until release is set"""
+    entered = threading.Event()
+
+    def run():
+        with gate.slot(session_id):
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert entered.wait(5)
+    return thread
+
+
+def test_slots_cap_in_flight_requests():
+    gate = RequestGate("chat", 2)
+    with gate.slot("a"), gate.slot("b"):
+        assert gate.stats()["in_flight"] == 2
+    assert gate.stats()["in_flight"] == 0
+
+
+def test_submitted_work_is_served_round_robin_across_sessions():
+    order = []
+    gate = RequestGate("speech", 1, executor=ThreadPoolExecutor(2))
+    release = threading.Event()
+    holder = hold_slot(gate, "x", release)
+    futures = [gate.submit("a", order.append, f"a{i}") for i in range(3)]
+    futures += [gate.submit("b", order.append, f"b{i}") for i in range(2)]
+    release.set()
+    holder.join()
+    wait(futures, timeout=5)
+    assert order == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_full_queue_rejects_new_requests():
+    gate = RequestGate("speech", 0, max_queue=1, executor=ThreadPoolExecutor(1))
+    gate.submit("a", time.sleep, 0)
+    with pytest.raises(GateFull):
+        gate.submit("b", time.sleep, 0)
+    assert gate.stats()["rejected"] == 1
+
+
+def test_on_wait_reports_queue_position():
+    gate = RequestGate("chat", 1)
+    release = threading.Event()
+    holder = hold_slot(gate, "x", release)
+    positions = []
+
+    def on_wait(position):
+        positions.append(position)
+        release.set()
+
+    with gate.slot("a", on_wait=on_wait, poll_interval=0.01):
+        pass
+    holder.join()
+    assert positions == [1]
+
+
+def test_wait_timeout_gives_up_the_place_in_line():
+    gate = RequestGate("chat", 1, wait_timeout=0.05)
+    release = threading.Event()
+    holder = hold_slot(gate, "x", release)
+    with pytest.raises(GateFull):
+        with gate.slot("a", poll_interval=0.01):
+            pass
+    release.set()
+    holder.join()
+    stats = gate.stats()
+    assert (stats["in_flight"], stats["queued"], stats["timeouts"]) == (0, 0, 1)
+
+
+def test_exception_while_queued_does_not_leak_the_slot():
+    gate = RequestGate("chat", 1)
+    release = threading.Event()
+    holder = hold_slot(gate, "x", release)
+
+    def interrupted(position):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        with gate.slot("a", on_wait=interrupted, poll_interval=0.01):
+            pass
+    release.set()
+    holder.join()
+    assert gate.stats()["in_flight"] == 0
+    assert gate.stats()["queued"] == 0
+    with gate.slot("b", poll_interval=0.01):
+        assert gate.stats()["in_flight"] == 1
+
+
+def test_exception_after_grant_releases_the_slot():
+    gate = RequestGate("chat", 1)
+    release = threading.Event()
+    holder = hold_slot(gate, "x", release)
+
+    def granted_meanwhile(position):
+        # The slot frees up (and is granted to this ticket) before the error
+        release.set()
+        holder.join()
+        raise RuntimeError("rerun")
+
+    with pytest.raises(RuntimeError):
+        with gate.slot("a", on_wait=granted_meanwhile, poll_interval=0.01):
+            pass
+    assert gate.stats()["in_flight"] == 0
+
+
+def test_occupied_requests_hold_back_queued_work():
+    gate = RequestGate("test", limit=1, executor=ThreadPoolExecutor(2))
+    release = gate.occupy()
+    future = gate.submit("a", lambda: "done")
+
+    time.sleep(0.05)
+    assert not future.done()
+    assert gate.stats()["occupied"] == 1
+    release()
+    assert future.result(timeout=2) == "done"
+    assert gate.stats()["in_flight"] == 0
@@ -0,0 +1,148 @@
+import sqlite3
+
+import pytest
+
+import session_store
+from session_store import SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    # A long flush interval so only explicit flushes and reads write to the database
+    return SessionStore(str(tmp_path / "sessions" / "test.db"), flush_interval=60)
+
+
+def message(index):
+    return {"role": "user" if index % 2 == 0 else "assistant", "content": f"消息 {index}", "id": index}
+
+
+def test_session_round_trip(store):
+    assert store.load_session("s1") is None
+
+    store.save_session("s1", {"user_info": {"name": "小明"}, "summarized_upto": 0})
+    history = store.history("s1")
+    for index in range(3):
+        history.append(message(index))
+    store.save_audio_key("s1", 1, "key-1")
+
+    assert store.load_session("s1") == ({"user_info": {"name": "小明"}, "summarized_upto": 0}, 3)
+    assert store.load_audio_keys("s1") == {1: "key-1"}
+    assert store.load_session("other") is None
+
+
+def test_writes_survive_reopening(tmp_path):
+    path = str(tmp_path / "test.db")
+    first = SessionStore(path, flush_interval=60)
+    first.save_session("s1", {"onboarding_state": "free_chat"})
+    first.history("s1").append(message(0))
+    first.flush()
+
+    second = SessionStore(path, flush_interval=60)
+    state, count = second.load_session("s1")
+    assert state == {"onboarding_state": "free_chat"}
+    assert list(second.history("s1", count)) == [message(0)]
+
+
+def test_history_behaves_like_a_list(store):
+    history = store.history("s1")
+    for index in range(5):
+        history.append(message(index))
+
+    assert len(history) == 5
+    assert history[0] == message(0)
+    assert history[-1] == message(4)
+    assert history[1:3] == [message(1), message(2)]
+    assert history[3:] == [message(3), message(4)]
+    assert history[4:2] == []
+    assert history[::2] == [message(0), message(2), message(4)]
+    with pytest.raises(IndexError):
+        history[5]
+
+
+def test_history_pages_messages_in_on_access(store, monkeypatch):
+    monkeypatch.setattr(session_store, "PAGE_SIZE", 2)
+    writer = store.history("s1")
+    for index in range(6):
+        writer.append(message(index))
+    store.flush()
+
+    history = store.history("s1", 6)
+    assert history.loaded_count() == 0
+    assert history[-1] == message(5)
+    # The last message's page
+    assert history.loaded_count() == 2
+    assert list(history) == [message(index) for index in range(6)]
+    assert history.loaded_count() == 6
+
+
+def test_idle_histories_are_evicted_and_reload(store):
+    history = store.history("s1")
+    history.append(message(0))
+    history.last_access -= 100
+
+    assert store.evict_idle(idle_seconds=10, sweep_interval=0) == 1
+    assert history.loaded_count() == 0
+    assert history[0] == message(0)
+    # Recently used now
+    assert store.evict_idle(idle_seconds=10, sweep_interval=0) == 0
+
+
+def test_lease_keeps_a_second_owner_out_until_it_expires(store):
+    store.save_session("s1", {})
+    assert store.claim("s1", "tab-a", lease_seconds=60)
+    assert store.claim("s1", "tab-a", lease_seconds=60)
+    assert not store.claim("s1", "tab-b", lease_seconds=60)
+
+    assert store.claim("s1", "tab-a", lease_seconds=-1)
+    assert store.claim("s1", "tab-b", lease_seconds=60)
+
+
+def test_lease_of_a_closed_tab_is_void(store):
+    store.save_session("s1", {})
+    store.claim("s1", "tab-a", lease_seconds=60)
+
+    assert store.claim("s1", "tab-b", lease_seconds=60, owner_alive=lambda owner: owner != "tab-a")
+
+
+def test_unsaved_session_is_free(store):
+    assert store.claim("new", "tab-a", lease_seconds=60)
+    assert store.load_session("new") is None
+
+
+def test_saving_keeps_the_lease(store):
+    store.save_session("s1", {"step": 1})
+    store.claim("s1", "tab-a", lease_seconds=60)
+    store.save_session("s1", {"step": 2})
+
+    assert not store.claim("s1", "tab-b", lease_seconds=60)
+    assert store.load_session("s1") == ({"step": 2}, 0)
+
+
+def test_fork_copies_the_conversation(store):
+    store.save_session("s1", {"step": 1})
+    history = store.history("s1")
+    history.append(message(0))
+    store.save_audio_key("s1", 0, "key-0")
+    store.claim("s1", "tab-a", lease_seconds=60)
+
+    store.fork("s1", "s2")
+    store.history("s2", 1).append(message(1))
+
+    assert store.load_session("s2") == ({"step": 1}, 2)
+    assert store.load_audio_keys("s2") == {0: "key-0"}
+    assert store.load_session("s1") == ({"step": 1}, 1)
+    # The copy has no lease yet
+    assert store.claim("s2", "tab-b", lease_seconds=60)
+
+
+def test_old_databases_gain_the_lease_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sessions (session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)")
+    conn.execute("INSERT INTO sessions VALUES ('s1', '{}', 0)")
+    conn.commit()
+    conn.close()
+
+    store = SessionStore(path, flush_interval=60)
+    assert store.claim("s1", "tab-a", lease_seconds=60)
+    assert not store.claim("s1", "tab-b", lease_seconds=60)
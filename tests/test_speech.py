@@ -0,0 +1,78 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from call_policy import CallPolicy
+from speech import FallbackSpeech, OpenAISpeech, audio_format
+
+
+class FakeSpeechClient:
+    """audio.speech.create returning the input as mp3 bytes, optionally after a pause per request"""
+
+    def __init__(self, pauses=()):
+        self.pauses = list(pauses)
+        self.requests = 0
+        self.audio = SimpleNamespace(speech=SimpleNamespace(create=self.create))
+
+    def create(self, model, voice, input, timeout=None):
+        self.requests += 1
+        pause = self.pauses.pop(0) if self.pauses else 0
+        time.sleep(pause)
+        return SimpleNamespace(content=b"ID3" + input.encode())
+
+
+class LocalSpeech:
+    model = "local"
+    voice = "local"
+
+    def synthesize(self, text, on_request=None):
+        if on_request is not None:
+            on_request(self)
+        return b"RIFF" + text.encode()
+
+
+def wait_for(condition, seconds=2):
+    deadline = time.monotonic() + seconds
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_audio_format():
+    assert audio_format(b"RIFF....") == "audio/wav"
+    assert audio_format(b"ID3....") == "audio/mp3"
+
+
+def test_every_hedged_request_is_reported():
+    client = FakeSpeechClient(pauses=[0.3, 0])
+    policy = CallPolicy("tts", timeout=5.0, hedge_percentile=0.5, hedge_min_samples=1)
+    policy._observe(0.02)
+    speech = OpenAISpeech(lambda: client, policy=policy)
+    requests = []
+
+    assert speech.synthesize("你好", requests.append) == "ID3你好".encode()
+    # The duplicate won; the first request still completes and is billed
+    assert wait_for(lambda: len(requests) == 2)
+    assert client.requests == 2
+
+
+def test_late_primary_is_reported_and_counted_until_it_ends():
+    client = FakeSpeechClient(pauses=[0.2])
+    released = threading.Event()
+    late = []
+    speech = FallbackSpeech(
+        OpenAISpeech(lambda: client), LocalSpeech(), deadline=0.05,
+        on_late_result=lambda backend, text, audio: late.append(audio),
+        occupy=lambda: released.set
+    )
+    requests = []
+
+    backend, audio = speech.synthesize("你好", lambda backend: requests.append(backend.model))
+
+    assert backend is speech.fallback and audio == "RIFF你好".encode()
+    assert wait_for(lambda: late)
+    assert released.is_set()
+    assert sorted(requests) == ["local", "tts-1"]
+    assert speech.stats() == {"primary_calls": 0, "fallback_calls": 1, "deadline_misses": 1}
+    # The primary is skipped during the cooldown
+    assert speech.choose_backend() is speech.fallback
@@ -0,0 +1,76 @@
+import asyncio
+import concurrent.futures
+from types import SimpleNamespace
+
+import pytest
+
+from turn_engine import TurnEngine
+
+
+def chunk(content=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeClient:
+    """Streams the given chunks, pausing between them"""
+
+    def __init__(self, chunks, pause=0.0):
+        self.chunks = chunks
+        self.pause = pause
+        self.sent = 0
+        self.closed = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, stream, **request):
+        return self.stream()
+
+    async def stream(self):
+        try:
+            for item in self.chunks:
+                await asyncio.sleep(self.pause)
+                self.sent += 1
+                yield item
+        finally:
+            self.closed = True
+
+
+def test_turn_streams_deltas_and_returns_text_usage_and_after_reply():
+    usage = SimpleNamespace(total_tokens=7)
+    client = FakeClient([chunk("Hi\n"), chunk("there"), chunk("\nbye"), chunk(usage=usage)])
+    engine = TurnEngine(lambda: client)
+    lines = []
+
+    turn = engine.start({}, on_line=lambda line, text: lines.append(line),
+                        after_reply={"length": len})
+
+    assert list(turn.deltas()) == ["Hi\n", "there", "\nbye"]
+    assert turn.result(timeout=5) == ("Hi\nthere\nbye", usage, {"length": 12})
+    assert lines == ["Hi", "there"]
+    assert turn.finished.wait(5)
+
+
+def test_cancel_stops_the_stream_and_waits_for_it():
+    client = FakeClient([chunk(str(i)) for i in range(1000)], pause=0.01)
+    turn = TurnEngine(lambda: client).start({})
+    deltas = turn.deltas()
+    next(deltas)
+
+    assert turn.cancel(timeout=5)
+    assert client.closed
+    assert client.sent < 1000
+    with pytest.raises(concurrent.futures.CancelledError):
+        turn.result(timeout=0)
+
+
+def test_cancel_before_the_turn_starts_still_finishes():
+    engine = TurnEngine(lambda: FakeClient([chunk("x")]))
+    # Keep the loop busy so the turn is cancelled before its task runs
+    blocker = concurrent.futures.Future()
+    engine._loop_thread.call(lambda: blocker.result(timeout=5) and None)
+    turn = engine.start({})
+    finished = concurrent.futures.ThreadPoolExecutor(1).submit(turn.cancel, 5)
+    blocker.set_result(None)
+
+    assert finished.result(timeout=5)
+    assert list(turn.deltas()) == []
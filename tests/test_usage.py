@@ -0,0 +1,96 @@
+import json
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+import usage
+from usage import UsageTotals, UsageTracker, cached_prompt_tokens, completion_cost, configure_usage_log
+
+
+def completion_usage(prompt, completion, cached=None):
+    details = SimpleNamespace(cached_tokens=cached) if cached is not None else None
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, prompt_tokens_details=details)
+
+
+@pytest.fixture
+def ledger_log(tmp_path):
+    """Route the ledger to a small rotating file for the test, then restore it"""
+    path = tmp_path / "usage.jsonl"
+    configure_usage_log(str(path), max_bytes=400, backup_count=2)
+    yield path
+    for handler in list(usage.ledger.handlers):
+        usage.ledger.removeHandler(handler)
+        handler.close()
+    usage.ledger.setLevel(logging.NOTSET)
+
+
+def test_completion_cost_per_model():
+    # gpt-4o-mini: $0.15 prompt, $0.075 cached prompt, $0.60 completion per 1M tokens
+    assert completion_cost("gpt-4o-mini", 1_000_000, 0, 0) == pytest.approx(0.15)
+    assert completion_cost("gpt-4o-mini", 1_000_000, 1_000_000, 0) == pytest.approx(0.075)
+    assert completion_cost("gpt-4o", 1000, 400, 100) == pytest.approx((600 * 2.50 + 400 * 1.25 + 100 * 10.00) / 1e6)
+    assert completion_cost("unknown-model", 1000, 0, 1000) == 0
+
+
+def test_cached_prompt_tokens():
+    assert cached_prompt_tokens(completion_usage(100, 10, cached=64)) == 64
+    assert cached_prompt_tokens(completion_usage(100, 10)) == 0
+
+
+def test_record_returns_the_request_numbers():
+    tracker = UsageTracker()
+    numbers = tracker.record("chat_turn", "gpt-3.5-turbo", completion_usage(1000, 200, cached=0))
+
+    assert numbers == {"prompt_tokens": 1000, "cached_tokens": 0, "completion_tokens": 200}
+    assert tracker.record("chat_turn", "gpt-3.5-turbo", None) is None
+    assert tracker.stats()["cost"] == pytest.approx((1000 * 0.50 + 200 * 1.50) / 1e6)
+
+
+def test_speech_is_billed_per_character():
+    tracker = UsageTracker()
+    tracker.record_speech("tts-1", "你好世界")
+    tracker.record_speech("espeak-ng", "你好世界")
+
+    totals = tracker.process.by_purpose()["tts"]
+    assert totals["requests"] == 2
+    assert totals["characters"] == 8
+    assert totals["cost"] == pytest.approx(4 * 15.00 / 1e6)
+
+
+def test_sessions_and_process_are_totalled_separately():
+    tracker = UsageTracker()
+    first, second = UsageTotals(), UsageTotals()
+    tracker.record("chat_turn", "gpt-4o-mini", completion_usage(100, 10, cached=50), session=first)
+    tracker.record("summary", "gpt-4o-mini", completion_usage(300, 30), session=second)
+    tracker.record_request("health_check")
+
+    assert first.totals()["prompt_tokens"] == 100
+    assert first.totals()["cache_hit_rate"] == 0.5
+    assert second.totals()["prompt_tokens"] == 300
+    process = tracker.stats()
+    assert process["requests"] == 3
+    assert process["prompt_tokens"] == 400
+    assert process["cache_hit_rate"] == 50 / 400
+    assert set(tracker.process.by_purpose()) == {"chat_turn", "summary", "health_check"}
+
+
+def test_ledger_writes_one_json_line_per_call(ledger_log):
+    tracker = UsageTracker()
+    tracker.record("chat_turn", "gpt-4o-mini", completion_usage(100, 10), session_id="s1")
+
+    entry = json.loads(ledger_log.read_text(encoding="utf-8").splitlines()[0])
+    assert entry["purpose"] == "chat_turn"
+    assert entry["model"] == "gpt-4o-mini"
+    assert entry["session_id"] == "s1"
+    assert entry["prompt_tokens"] == 100
+
+
+def test_ledger_rotates_by_size(ledger_log):
+    tracker = UsageTracker()
+    for _ in range(20):
+        tracker.record_speech("tts-1", "你好", session_id="s1")
+
+    files = sorted(path.name for path in ledger_log.parent.iterdir())
+    assert files == ["usage.jsonl", "usage.jsonl.1", "usage.jsonl.2"]
+    assert all(path.stat().st_size <= 400 for path in ledger_log.parent.iterdir())